@@ -0,0 +1,387 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from statistics import NormalDist
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from data_loader import normalize
+from microdata import CHUNK_ROWS, iter_chunks, parse_layout, record_ranges, replicate_weights
+from sketch import DECIS, N_BINS, distribution_columns, gini, histogram, quantiles
+
+MICRODATA_COLUMNS = ["Ano", "Trimestre", "UF", "V1028", "V4013", "VD4002", "VD4009", "VD4019"]
+
+# Somas ponderadas (aditivas) na ordem das colunas da matriz de indicadores
+MEASURES = [
+    "n_ocup_pond",
+    "renda_total_pond",
+    "n_empregador_pond",
+    "renda_empregador_pond",
+    "n_conta_propria_pond",
+    "renda_conta_propria_pond",
+]
+
+# Razões calculadas a partir das somas: coluna -> (numerador, denominador)
+RATIOS = {
+    "Renda Média_Total": ("renda_total_pond", "n_ocup_pond"),
+    "Renda Média_empregador": ("renda_empregador_pond", "n_empregador_pond"),
+    "Renda Média_conta_propria": ("renda_conta_propria_pond", "n_conta_propria_pond"),
+}
+
+OUTPUT_COLUMNS = [
+    "n_ocup_pond",
+    "renda_total_pond",
+    "Renda Média_Total",
+    "n_empregador_pond",
+    "renda_empregador_pond",
+    "Renda Média_empregador",
+    "n_conta_propria_pond",
+    "renda_conta_propria_pond",
+    "Renda Média_conta_propria",
+]
+
+# Módulos da distribuição de renda (sketch): sufixo -> coluna de MEASURES
+# que define a população
+DISTRIBUTIONS = {
+    "Total": "n_ocup_pond",
+    "empregador": "n_empregador_pond",
+    "conta_propria": "n_conta_propria_pond",
+}
+DISTRIBUTION_COLUMNS = [c for s in DISTRIBUTIONS for c in distribution_columns(s).values()]
+
+# Pesos replicados bootstrap (V1028001..V1028200)
+REPLICATES = 200
+REPLICATE_MATRIX = "V1028_replicados"
+# com réplicas cada linha carrega 200 pesos; blocos menores limitam a memória
+REPLICATE_CHUNK_ROWS = 10_000
+BLOCK_ROWS = 2048
+
+# Fatias de registros para processamento paralelo. O tamanho não depende
+# do número de workers: as mesmas fatias, combinadas na mesma ordem, dão
+# resultados idênticos bit a bit no modo serial e no paralelo.
+SPLIT_RECORDS = 65_536
+
+CONFIDENCE = 0.95
+Z_SCORE = NormalDist().inv_cdf(0.5 + CONFIDENCE / 2)
+
+# VD4002: condição de ocupação; VD4009: posição na ocupação
+OCUPADO = 1
+EMPREGADOR = 8
+CONTA_PROPRIA = 9
+
+# Seções da CNAE 2.0 pelas divisões (dois primeiros dígitos de V4013)
+SECOES_CNAE = "ABCDEFGHIJKLMNOPQRSTU"
+_DIVISOES = [
+    (1, 3), (5, 9), (10, 33), (35, 35), (36, 39), (41, 43), (45, 47), (49, 53),
+    (55, 56), (58, 63), (64, 66), (68, 68), (69, 75), (77, 82), (84, 84), (85, 85),
+    (86, 88), (90, 93), (94, 96), (97, 97), (99, 99),
+]
+_SECAO_POR_DIVISAO = np.zeros(100, dtype=np.int64)
+for _codigo, (_ini, _fim) in enumerate(_DIVISOES, start=1):
+    _SECAO_POR_DIVISAO[_ini:_fim + 1] = _codigo
+
+
+def secao_cnae(v4013: np.ndarray) -> np.ndarray:
+    # Código 1..21 (A..U); 0 = atividade mal definida ou ausente
+    divisao = np.clip(v4013 // 1000, 0, 99)
+    return np.where(v4013 > 0, _SECAO_POR_DIVISAO[divisao], 0)
+
+
+def group_key(ano, trimestre, uf, secao) -> np.ndarray:
+    # Chave inteira Ano×Trimestre×UF×CNAE
+    return ((ano.astype(np.int64) * 10 + trimestre) * 100 + uf) * 100 + secao
+
+
+def split_key(key: np.ndarray):
+    secao = key % 100
+    uf = key // 100 % 100
+    trimestre = key // 10_000 % 10
+    ano = key // 100_000
+    return ano, trimestre, uf, secao
+
+
+def indicator_matrix(chunk: dict) -> np.ndarray:
+    # Uma coluna por medida de MEASURES, para pessoas ocupadas
+    ocupado = chunk["VD4002"] == OCUPADO
+    renda = np.nan_to_num(chunk["VD4019"], nan=0.0)
+    posicao = chunk["VD4009"]
+
+    empregador = ocupado & (posicao == EMPREGADOR)
+    conta_propria = ocupado & (posicao == CONTA_PROPRIA)
+
+    return np.column_stack([
+        ocupado,
+        ocupado * renda,
+        empregador,
+        empregador * renda,
+        conta_propria,
+        conta_propria * renda,
+    ]).astype(np.float64)
+
+
+def segment_sum(inverse: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    # Soma das linhas de values (n, ...) por grupo -> (n_groups, ...)
+    out = np.zeros((n_groups,) + values.shape[1:])
+    if len(inverse) == 0:
+        return out
+    order = np.argsort(inverse, kind="stable")
+    g = inverse[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    out[g[starts]] = np.add.reduceat(values[order], starts, axis=0)
+    return out
+
+
+def weighted_group_sums(
+    inverse: np.ndarray,
+    indicators: np.ndarray,
+    weights: np.ndarray,
+    n_groups: int,
+    block_rows: int = BLOCK_ROWS,
+) -> np.ndarray:
+    # S[g] = X_g^T W_g para todos os grupos e todas as colunas de peso de
+    # uma vez: indicators (n, M), weights (n, K) -> (n_groups, M, K).
+    # O produto (linhas, M, K) é formado em blocos de block_rows linhas.
+    order = np.argsort(inverse, kind="stable")
+    out = np.zeros((n_groups, indicators.shape[1], weights.shape[1]))
+    for i in range(0, len(order), block_rows):
+        idx = order[i:i + block_rows]
+        g = inverse[idx]
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+        prod = indicators[idx, :, None] * weights[idx, None, :]
+        out[g[starts]] += np.add.reduceat(prod, starts, axis=0)
+    return out
+
+
+def estimates(sums: np.ndarray) -> dict:
+    # sums (G, len(MEASURES), K) -> {coluna: (G, K)}, uma coluna por peso
+    by_measure = dict(zip(MEASURES, np.moveaxis(sums, 1, 0)))
+    out = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for col in OUTPUT_COLUMNS:
+            if col in RATIOS:
+                num, den = RATIOS[col]
+                out[col] = by_measure[num] / by_measure[den]
+            else:
+                out[col] = by_measure[col]
+    return out
+
+
+def bootstrap_se(replicas: np.ndarray) -> np.ndarray:
+    # Variância bootstrap: sum((theta_r - media)^2) / (R - 1)
+    if replicas.shape[1] < 2:
+        return np.full(len(replicas), np.nan)
+    with np.errstate(invalid="ignore"):
+        return np.nanstd(replicas, axis=1, ddof=1)
+
+
+class Aggregator:
+    """Somas ponderadas por grupo, acumuladas bloco a bloco.
+
+    Com replicates > 0, cada soma é calculada também para os pesos
+    replicados, o que permite estimar erros-padrão bootstrap.
+
+    Com distribution=True, guarda também um sketch de quantis da renda
+    (VD4019, peso V1028) por grupo e módulo (ver sketch.py), de onde
+    saem decis, mediana e Gini.
+
+    Duas instâncias podem ser combinadas com merge(); a operação é
+    associativa, então blocos e arquivos podem ser processados em
+    qualquer partição e somados depois.
+    """
+
+    def __init__(self, by_uf: bool = True, by_cnae: bool = True, replicates: int = 0,
+                 distribution: bool = False):
+        self.by_uf = by_uf
+        self.by_cnae = by_cnae
+        self.replicates = replicates
+        self.distribution = distribution
+        self.keys = np.empty(0, dtype=np.int64)
+        # (grupos, medidas, 1 + réplicas); o índice 0 é o peso V1028
+        self.sums = np.empty((0, len(MEASURES), 1 + replicates))
+        # (grupos, módulos, bins) com distribution; senão None
+        self.hist = np.empty((0, len(DISTRIBUTIONS), N_BINS)) if distribution else None
+
+    def update(self, chunk: dict) -> "Aggregator":
+        ocupado = chunk["VD4002"] == OCUPADO
+        if not ocupado.any():
+            return self
+        chunk = {k: v[ocupado] for k, v in chunk.items()}
+
+        n = len(chunk["Ano"])
+        uf = chunk["UF"] if self.by_uf else np.zeros(n, dtype=np.int64)
+        secao = secao_cnae(chunk["V4013"]) if self.by_cnae else np.zeros(n, dtype=np.int64)
+        key = group_key(chunk["Ano"], chunk["Trimestre"], uf, secao)
+
+        weights = chunk["V1028"][:, None]
+        if self.replicates:
+            weights = np.column_stack([weights, chunk[REPLICATE_MATRIX]])
+        weights = np.nan_to_num(weights, nan=0.0)
+
+        keys, inverse = np.unique(key, return_inverse=True)
+        indicators = indicator_matrix(chunk)
+        hist = None
+        if self.distribution:
+            masks = indicators[:, [MEASURES.index(c) for c in DISTRIBUTIONS.values()]] > 0
+            hist = histogram(inverse, masks, chunk["VD4019"], weights[:, 0], len(keys))
+        self._add(keys, weighted_group_sums(inverse, indicators, weights, len(keys)), hist)
+        return self
+
+    def merge(self, other: "Aggregator") -> "Aggregator":
+        self._add(other.keys, other.sums, other.hist)
+        return self
+
+    def _add(self, keys: np.ndarray, sums: np.ndarray, hist: np.ndarray | None = None) -> None:
+        all_keys = np.concatenate([self.keys, keys])
+        all_sums = np.concatenate([self.sums, sums])
+        self.keys, inverse = np.unique(all_keys, return_inverse=True)
+        self.sums = segment_sum(inverse, all_sums, len(self.keys))
+        if self.distribution:
+            self.hist = segment_sum(inverse, np.concatenate([self.hist, hist]), len(self.keys))
+
+    def to_frame(self) -> pd.DataFrame:
+        ano, trimestre, uf, secao = split_key(self.keys)
+        data = {"Ano": ano, "Trimestre": trimestre}
+        if self.by_uf:
+            data["UF"] = uf
+        if self.by_cnae:
+            letras = np.array(["Mal definida"] + list(SECOES_CNAE))
+            data["Secao_CNAE"] = letras[secao]
+
+        est = estimates(self.sums)
+        for col in OUTPUT_COLUMNS:
+            data[col] = est[col][:, 0]
+
+        if self.replicates:
+            for col in OUTPUT_COLUMNS:
+                se = bootstrap_se(est[col][:, 1:])
+                data[f"{col}_se"] = se
+                data[f"{col}_ic_inf"] = data[col] - Z_SCORE * se
+                data[f"{col}_ic_sup"] = data[col] + Z_SCORE * se
+
+        if self.distribution:
+            qs = quantiles(self.hist, DECIS)
+            ginis = gini(self.hist)
+            for m, suffix in enumerate(DISTRIBUTIONS):
+                cols = distribution_columns(suffix)
+                for i, q in enumerate(DECIS):
+                    data[cols[q]] = qs[:, m, i]
+                data[cols["gini"]] = ginis[:, m]
+
+        return normalize(pd.DataFrame(data))
+
+
+def _aggregate_range(task) -> Aggregator:
+    path, start, stop, by_uf, by_cnae, replicates, distribution, chunk_rows, layout = task
+    agg = Aggregator(by_uf=by_uf, by_cnae=by_cnae, replicates=replicates, distribution=distribution)
+
+    matrices = {}
+    if replicates:
+        matrices[REPLICATE_MATRIX] = replicate_weights(layout, replicates)
+    chunk_rows = chunk_rows or (REPLICATE_CHUNK_ROWS if replicates else CHUNK_ROWS)
+
+    for chunk in iter_chunks(path, MICRODATA_COLUMNS, chunk_rows=chunk_rows, layout=layout,
+                             matrix_columns=matrices, start=start, stop=stop):
+        agg.update(chunk)
+    return agg
+
+
+def resolve_workers(workers: int | None) -> int:
+    # None/0 = todos os núcleos
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def aggregate_files(
+    paths: Iterable[str | Path],
+    by_uf: bool = True,
+    by_cnae: bool = True,
+    replicates: int = 0,
+    chunk_rows: int | None = None,
+    layout=None,
+    workers: int | None = 1,
+    split_records: int = SPLIT_RECORDS,
+    distribution: bool = False,
+) -> list:
+    # Um Aggregator por arquivo. Cada arquivo é dividido em fatias de
+    # registros distribuídas num pool de processos; as somas parciais de
+    # cada arquivo são combinadas sempre na ordem das fatias.
+    layout = layout or parse_layout()
+    paths = [str(p) for p in paths]
+    tasks = [
+        (path, start, stop, by_uf, by_cnae, replicates, distribution, chunk_rows, layout)
+        for path in paths
+        for start, stop in record_ranges(path, split_records, layout)
+    ]
+
+    results = {
+        path: Aggregator(by_uf=by_uf, by_cnae=by_cnae, replicates=replicates, distribution=distribution)
+        for path in paths
+    }
+    workers = min(resolve_workers(workers), max(len(tasks), 1))
+    if workers == 1:
+        parts = map(_aggregate_range, tasks)
+        for task, part in zip(tasks, parts):
+            results[task[0]].merge(part)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map devolve na ordem das tarefas
+            for task, part in zip(tasks, pool.map(_aggregate_range, tasks)):
+                results[task[0]].merge(part)
+
+    return [results[path] for path in paths]
+
+
+def aggregate_file(
+    path: str | Path,
+    by_uf: bool = True,
+    by_cnae: bool = True,
+    replicates: int = 0,
+    chunk_rows: int | None = None,
+    layout=None,
+    workers: int | None = 1,
+    distribution: bool = False,
+) -> Aggregator:
+    return aggregate_files([path], by_uf, by_cnae, replicates, chunk_rows, layout, workers,
+                           distribution=distribution)[0]
+
+
+def aggregate(
+    paths: Iterable[str | Path],
+    by_uf: bool = True,
+    by_cnae: bool = True,
+    replicates: int = 0,
+    distribution: bool = False,
+    **kwargs,
+) -> pd.DataFrame:
+    # Gera a tabela "Estatísticas - Agregadas" a partir dos microdados
+    agg = Aggregator(by_uf=by_uf, by_cnae=by_cnae, replicates=replicates, distribution=distribution)
+    for part in aggregate_files(paths, by_uf, by_cnae, replicates, distribution=distribution, **kwargs):
+        agg.merge(part)
+    return agg.to_frame()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrega microdados da PNAD Contínua.")
+    parser.add_argument("arquivos", nargs="+", help="arquivos PNADC_xxxxxx.txt")
+    parser.add_argument("-o", "--output", required=True, help="CSV de saída (sep=';', decimal=',')")
+    parser.add_argument("--sem-uf", action="store_true", help="não separar por UF")
+    parser.add_argument("--sem-cnae", action="store_true", help="não separar por seção CNAE")
+    parser.add_argument("--replicas", type=int, default=0, metavar="N",
+                        help=f"pesos replicados para erro-padrão (até {REPLICATES})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos em paralelo (0 = todos os núcleos)")
+    parser.add_argument("--distribuicao", action="store_true",
+                        help="decis, mediana e Gini da renda (sketch de quantis)")
+    args = parser.parse_args(argv)
+
+    df = aggregate(args.arquivos, by_uf=not args.sem_uf, by_cnae=not args.sem_cnae,
+                   replicates=args.replicas, workers=args.workers, distribution=args.distribuicao)
+    df.drop(columns="Periodo").to_csv(args.output, sep=";", decimal=",", index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,82 @@
 import warnings
 import dash
+from dash import dcc, html
+from flask import request
 
-from data_loader import load_data
 from styles import colors
-from layout import make_layout
+from layout import INDEX_STRING, PAGE_TITLE, make_layout
 from callbacks import register_callbacks
+from components import APRESENTACAO, PROJECOES, modulos_tab, series_store
+from config import (
+    CLIENTSIDE_FILTERING,
+    COMPRESS,
+    COMPRESS_MIN_BYTES,
+    DATA_PATH,
+    DOWNLOADS,
+    LAZY_START,
+    METRICS,
+    METRICS_PUBLIC,
+    RELOAD_WATCHER,
+)
+from downloads import register_downloads
+from instrumentation import instrument
+from webserver import enable_asset_caching, enable_compression, enable_health_checks
+from snapshot import DataStore
 
 warnings.filterwarnings("ignore")
 
-df = load_data()
-anos_disponiveis = sorted(df["Ano"].dropna().unique().tolist())
-ano_default = anos_disponiveis[0] if anos_disponiveis else None
+store = DataStore(PROJECOES, DATA_PATH, lazy=LAZY_START)
 
 app = dash.Dash(
     __name__,
     suppress_callback_exceptions=True,
-    title="PNAD – Ocupação e Renda",
+    title=PAGE_TITLE,
 )
 
-app.index_string = """
-<!DOCTYPE html>
-<html>
-    <head>
-        {%metas%}
-        <title>{%title%}</title>
-        {%favicon%}
-        {%css%}
-        <style>
-            body {
-                font-family: "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
-            }
-        </style>
-    </head>
-    <body>
-        {%app_entry%}
-        <footer>
-            {%config%}
-            {%scripts%}
-            {%renderer%}
-        </footer>
-    </body>
-</html>
-"""
-
-app.layout = make_layout()
-
-register_callbacks(app, df, anos_disponiveis, ano_default)
+# WSGI: gunicorn -w 8 app:server
+server = app.server
+
+app.index_string = INDEX_STRING
+
+def serve_layout():
+    # Montado a cada carregamento da página, para refletir novos trimestres;
+    # a aba de apresentação é estática (APRESENTACAO)
+    if not store.ready and not request.path.endswith("_dash-layout"):
+        # validação do Dash na primeira requisição, que pode ser /healthz:
+        # não espera a carga dos dados
+        return html.Div("Carregando dados…")
+    try:
+        snap = store.current()
+    except Exception:
+        # primeira carga falhou (o watcher tenta de novo); /readyz mostra o erro
+        return html.Div("Carregando dados…")
+    extra = []
+    if CLIENTSIDE_FILTERING:
+        # mesma chave do callback de detalhamento (sem filtros)
+        series = snap.figures.get_or_build(snap.fingerprint, ("series", None, None),
+                                           lambda: series_store(snap.table()))
+        extra.append(dcc.Store(id="store-series", data=series))
+    modulos = modulos_tab(snap.anos, snap.ano_default, CLIENTSIDE_FILTERING,
+                          snap.cube.options("UF"), snap.cube.options("Secao_CNAE"))
+    return make_layout(APRESENTACAO, modulos, extra)
+
+
+app.layout = serve_layout
+
+register_callbacks(app, store)
+if RELOAD_WATCHER:
+    store.start_watcher()
+
+if DOWNLOADS:
+    register_downloads(app.server, store)
+
+if METRICS:
+    instrument(app, public=METRICS_PUBLIC)
+
+enable_health_checks(app.server, store)
+enable_asset_caching(app.server)
+if COMPRESS:
+    enable_compression(app.server, min_size=COMPRESS_MIN_BYTES)
 
 if __name__ == "__main__":
     app.run_server(debug=True, host="127.0.0.1", port=8050)
\ No newline at end of file
@@ -0,0 +1,284 @@
+// Filtragem de ano/módulo/agregação no navegador (modo PNAD_CLIENTSIDE).
+// As séries chegam uma única vez em store-series; aqui refazemos o mesmo
+// cálculo de series.level_frame e montamos os traces das três figuras, no
+// formato do components.build_figures (um trace por gráfico).
+//
+// Na exportação estática (static_export.py) não há servidor: o layout e as
+// dependências vêm embutidos na página (#pnad-estatico) e as figuras de
+// arquivos JSON pré-renderizados (figuras_estaticas).
+(function () {
+    var embutido = document.getElementById("pnad-estatico");
+    if (!embutido) {
+        return;
+    }
+    var respostas = JSON.parse(embutido.textContent);
+    var original = window.fetch;
+    window.fetch = function (url) {
+        var nome = String(url).split("?")[0].split("/").pop();
+        if (Object.prototype.hasOwnProperty.call(respostas, nome)) {
+            return Promise.resolve(new Response(JSON.stringify(respostas[nome]), {
+                status: 200,
+                headers: {"Content-Type": "application/json"},
+            }));
+        }
+        return original.apply(this, arguments);
+    };
+})();
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    pnad: {
+        figuras_estaticas: function (modulo, ano, nivel) {
+            // mesmo caminho de static_export.figure_path
+            var nada = window.dash_clientside.no_update;
+            var url = "figuras/" + modulo + "/" +
+                (ano === null || ano === undefined ? "todos" : ano) + "-" + nivel + ".json";
+            return fetch(url)
+                .then(function (res) { return res.ok ? res.json() : [nada, nada, nada]; })
+                .catch(function () { return [nada, nada, nada]; });
+        },
+
+        filtrar_series: function (modulo, ano, nivel, store) {
+            var nada = window.dash_clientside.no_update;
+            if (!store || !store.modulos[modulo]) {
+                return [nada, nada, nada];
+            }
+            var vars = store.modulos[modulo];
+            var todos = ano === null || ano === undefined;
+
+            function razao(num, den) {
+                return num.map(function (n, k) {
+                    return den[k] ? n / den[k] : null;
+                });
+            }
+
+            function serie(linhas) {
+                // uma linha por período; com quebras por UF/CNAE, soma as
+                // medidas aditivas e descarta os intervalos de confiança
+                var s = {ano: [], periodo: [], v1: [], v2: [], ic: null, linhas: []};
+                var v1 = store.valores[vars[0]], v2 = store.valores[vars[1]];
+                linhas.forEach(function (i) {
+                    var n = s.periodo.length;
+                    if (n && s.periodo[n - 1] === store.periodo[i]) {
+                        s.v1[n - 1] += v1[i];
+                        s.v2[n - 1] += v2[i];
+                        s.duplicado = true;
+                    } else {
+                        s.ano.push(store.ano[i]);
+                        s.periodo.push(store.periodo[i]);
+                        s.v1.push(v1[i]);
+                        s.v2.push(v2[i]);
+                        s.linhas.push(i);
+                    }
+                });
+                if (!s.duplicado) {
+                    // decis/mediana só na série trimestral sem soma de quebras
+                    var dist = store.distribuicao && store.distribuicao[vars[2]];
+                    if (dist) {
+                        s.dist = {};
+                        Object.keys(dist).forEach(function (k) {
+                            s.dist[k] = dist[k] && linhas.map(function (i) { return dist[k][i]; });
+                        });
+                    }
+                    s.ic = {};
+                    vars.forEach(function (v) {
+                        var ic = store.ic[v];
+                        if (ic) {
+                            s.ic[v] = [linhas.map(function (i) { return ic[0][i]; }),
+                                       linhas.map(function (i) { return ic[1][i]; })];
+                        }
+                    });
+                }
+                return s;
+            }
+
+            function blocos(s, chaves, media) {
+                // agrupa trechos consecutivos de chaves iguais (média ou soma)
+                var out = {ano: [], periodo: [], v1: [], v2: [], n: [], ic: null, ultimo: []};
+                chaves.forEach(function (c, k) {
+                    var m = out.periodo.length;
+                    if (!m || chaves[k - 1] !== c) {
+                        out.ano.push(s.ano[k]);
+                        out.periodo.push(s.periodo[k]);
+                        out.ultimo.push(s.periodo[k]);
+                        out.v1.push(0);
+                        out.v2.push(0);
+                        out.n.push(0);
+                        m += 1;
+                    }
+                    out.ultimo[m - 1] = s.periodo[k];
+                    if (s.v1[k] !== null && s.v2[k] !== null) {
+                        out.v1[m - 1] += s.v1[k];
+                        out.v2[m - 1] += s.v2[k];
+                        out.n[m - 1] += 1;
+                    }
+                });
+                if (media) {
+                    out.v1 = out.v1.map(function (v, k) { return out.n[k] ? v / out.n[k] : null; });
+                    out.v2 = out.v2.map(function (v, k) { return out.n[k] ? v / out.n[k] : null; });
+                }
+                return out;
+            }
+
+            function movel(s, janela) {
+                var out = {ano: s.ano, periodo: s.periodo, v1: [], v2: [], ic: null};
+                var a = 0, b = 0;
+                for (var k = 0; k < s.periodo.length; k++) {
+                    a += s.v1[k];
+                    b += s.v2[k];
+                    if (k >= janela) {
+                        a -= s.v1[k - janela];
+                        b -= s.v2[k - janela];
+                    }
+                    out.v1.push(k >= janela - 1 ? a / janela : null);
+                    out.v2.push(k >= janela - 1 ? b / janela : null);
+                }
+                return out;
+            }
+
+            function filtrar(s, manter) {
+                var idx = s.ano.map(function (_, k) { return k; }).filter(manter);
+                return {
+                    ano: idx.map(function (k) { return s.ano[k]; }),
+                    periodo: idx.map(function (k) { return s.periodo[k]; }),
+                    v1: idx.map(function (k) { return s.v1[k]; }),
+                    v2: idx.map(function (k) { return s.v2[k]; }),
+                    ic: null,
+                };
+            }
+
+            var linhas = [];
+            for (var i = 0; i < store.ano.length; i++) {
+                if (nivel === "movel" || todos || store.ano[i] === ano) {
+                    linhas.push(i);
+                }
+            }
+            var s = serie(linhas);
+            if (nivel === "movel") {
+                s = movel(s, 4);
+                if (!todos) {
+                    s = filtrar(s, function (k) { return s.ano[k] === ano; });
+                }
+            } else if (nivel === "anual") {
+                var anual = blocos(s, s.ano, true);
+                anual.periodo = anual.ano.map(function (a, k) {
+                    return anual.n[k] >= 4 ? String(a) : a + " (" + anual.n[k] + "T)";
+                });
+                s = anual;
+            }
+
+            var limite = store.limites.pontos;
+            if (limite > 0 && s.periodo.length > limite) {
+                var total = s.periodo.length;
+                var chaves = s.periodo.map(function (_, k) { return Math.floor(k * limite / total); });
+                var reduzido = blocos(s, chaves, true);
+                reduzido.periodo = reduzido.periodo.map(function (p, k) {
+                    return p + "–" + reduzido.ultimo[k];
+                });
+                s = reduzido;
+            }
+            var valores = {};
+            valores[vars[0]] = s.v1;
+            valores[vars[1]] = s.v2;
+            valores[vars[2]] = razao(s.v2, s.v1);
+
+            function erro(variavel) {
+                var ic = s.ic && s.ic[variavel];
+                if (!ic) {
+                    return undefined;
+                }
+                var y = valores[variavel];
+                return {
+                    type: "data",
+                    array: y.map(function (v, k) { return ic[1][k] - v; }),
+                    arrayminus: y.map(function (v, k) { return v - ic[0][k]; }),
+                };
+            }
+
+            function barras(variavel, cores) {
+                var trace = {
+                    type: "bar",
+                    x: s.periodo,
+                    y: valores[variavel],
+                    name: "",
+                    alignmentgroup: "True",
+                    offsetgroup: "",
+                    orientation: "v",
+                    showlegend: false,
+                    textposition: "auto",
+                    marker: {color: s.periodo.map(function (_, k) { return cores[k % cores.length]; })},
+                    hovertemplate: "Periodo=%{x}<br>" + variavel + "=%{y}<extra></extra>",
+                    xaxis: "x",
+                    yaxis: "y",
+                };
+                var e = erro(variavel);
+                if (e) {
+                    trace.error_y = e;
+                }
+                return [trace];
+            }
+
+            function linha(variavel) {
+                var trace = {
+                    type: s.periodo.length > store.limites.webgl ? "scattergl" : "scatter",
+                    mode: "lines+markers",
+                    x: s.periodo,
+                    y: valores[variavel],
+                    name: "",
+                    showlegend: false,
+                    line: {color: store.cores.linha, width: 3, dash: "solid"},
+                    marker: {color: store.cores.marcador, size: 8, symbol: "circle"},
+                    hovertemplate: "Periodo=%{x}<br>" + variavel + "=%{y}<extra></extra>",
+                    xaxis: "x",
+                    yaxis: "y",
+                };
+                var e = erro(variavel);
+                if (e) {
+                    trace.error_y = e;
+                }
+                return [trace];
+            }
+
+            function distribuicao(media) {
+                // faixa D1–D9 e mediana por baixo da média
+                var d = s.dist;
+                if (!d || !d.mediana.some(function (v) { return v !== null; })) {
+                    return media;
+                }
+                media[0].name = "Média";
+                media[0].showlegend = true;
+                var mediana = {
+                    type: "scatter",
+                    mode: "lines+markers",
+                    x: s.periodo,
+                    y: d.mediana,
+                    name: "Mediana",
+                    line: {color: store.cores.mediana, width: 2, dash: "dash"},
+                    marker: {size: 6},
+                    hovertemplate: "Periodo=%{x}<br>Mediana=%{y}" + (d.gini ? "<br>Gini=%{customdata:.3f}" : "") + "<extra></extra>",
+                };
+                if (d.gini) {
+                    mediana.customdata = d.gini;
+                }
+                return [
+                    {type: "scatter", mode: "lines", x: s.periodo, y: d.d9, line: {width: 0},
+                     showlegend: false, hoverinfo: "skip"},
+                    {type: "scatter", mode: "lines", x: s.periodo, y: d.d1, line: {width: 0},
+                     fill: "tonexty", fillcolor: store.cores.faixa, name: "D1–D9", hoverinfo: "skip"},
+                    mediana,
+                ].concat(media);
+            }
+
+            var layouts = store.layouts[modulo];
+            var dados = [
+                barras(vars[0], store.cores.barras[0]),
+                barras(vars[1], store.cores.barras[1]),
+                distribuicao(linha(vars[2])),
+            ];
+
+            return dados.map(function (data, k) {
+                var layout = Object.assign({}, layouts[k], {template: store.template});
+                return {data: data, layout: layout};
+            });
+        },
+    },
+});
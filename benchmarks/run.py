@@ -0,0 +1,401 @@
+"""Benchmarks do painel: carga, filtragem, figuras e callback ponta a ponta.
+
+Uso (na raiz do repositório):
+
+    python -m benchmarks.run --escalas pequena media -o bench.json
+    python -m benchmarks.run --comparar bench-antigo.json bench.json
+
+Cada linha do arquivo de saída é um JSON com o nome do benchmark, a
+escala, os percentis de latência (s), a vazão e o pico de RSS.
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import aggregated_frame, quarters, write_microdata
+
+# (UFs, trimestres, seções CNAE, registros de microdados por trimestre)
+ESCALAS = {
+    "pequena": (1, 4, 1, 20_000),
+    "media": (27, 8, 21, 100_000),
+    "grande": (27, 40, 21, 200_000),
+}
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss está em KiB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def versions() -> dict:
+    import dash
+    import pandas
+    import plotly
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "plotly": plotly.__version__,
+        "dash": dash.__version__,
+    }
+
+
+def measure(func, repeat: int, warmup: int = 1) -> np.ndarray:
+    for _ in range(warmup):
+        func()
+    times = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def result(name: str, escala: str, times: np.ndarray, items: int = 1, **extra) -> dict:
+    p50, p95, p99 = np.quantile(times, [0.5, 0.95, 0.99])
+    out = {
+        "benchmark": name,
+        "escala": escala,
+        "repeticoes": len(times),
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+        "media": float(times.mean()),
+        "vazao": items / float(times.mean()) if times.mean() > 0 else None,
+        "pico_rss": peak_rss_bytes(),
+    }
+    out.update(extra)
+    return out
+
+
+def bench_load(escala: str, df, workdir: Path, repeat: int) -> list:
+    from data_loader import load_data
+
+    csv = workdir / f"agregado-{escala}.csv"
+    df.drop(columns="Periodo").to_csv(csv, sep=";", decimal=",", index=False)
+    xlsx = workdir / f"agregado-{escala}.xlsx"
+    df.drop(columns="Periodo").to_excel(xlsx, sheet_name="Estatísticas - Agregadas", index=False)
+    cache_dir = workdir / "cache"
+
+    rows = len(df)
+    return [
+        result("load_data_xlsx", escala, measure(lambda: load_data(xlsx, cache=False), repeat), rows, linhas=rows),
+        result("load_data_csv", escala, measure(lambda: load_data(csv, cache=False), repeat), rows, linhas=rows),
+        result("load_data_cache", escala,
+               measure(lambda: load_data(xlsx, cache_dir=cache_dir), repeat), rows, linhas=rows),
+    ]
+
+
+def bench_memory(escala: str, df) -> list:
+    # Memória do frame carregado, normal e compacto (PNAD_COMPACT)
+    from data_loader import compact_frame, memory_bytes
+
+    compact = compact_frame(df)
+    return [{"benchmark": "memoria_frame", "escala": escala, "linhas": len(df),
+             "bytes": memory_bytes(df), "bytes_compacto": memory_bytes(compact),
+             "razao": memory_bytes(compact) / memory_bytes(df)}]
+
+
+def bench_filter(escala: str, df, repeat: int) -> list:
+    from components import PROJECOES
+    from data_loader import build_index
+
+    ano = int(df["Ano"].iloc[-1])
+    index = build_index(df, PROJECOES)
+
+    def mask_copy():
+        dff = df[df["Ano"] == ano].copy()
+        dff["Periodo"] = dff["Periodo"].cat.remove_unused_categories()
+
+    return [
+        result("filtro_mascara_copia", escala, measure(mask_copy, repeat * 10), linhas=len(df)),
+        result("filtro_indice", escala,
+               measure(lambda: index.view("total", ano), repeat * 10), linhas=len(df)),
+    ]
+
+
+def bench_figures(escala: str, df, repeat: int) -> list:
+    from components import MODULOS, PROJECOES, figures_json, layout_three_charts
+    from data_loader import build_index
+
+    index = build_index(df, PROJECOES)
+    var1, var2, var3, titulo = MODULOS["total"]
+    ano = int(df["Ano"].iloc[-1])
+    dff = index.view("total", ano)
+    dfa = index.view("total")
+
+    return [
+        result("layout_three_charts_ano", escala,
+               measure(lambda: layout_three_charts(dff, var1, var2, var3, titulo), repeat), linhas=len(dff)),
+        result("layout_three_charts_todos", escala,
+               measure(lambda: layout_three_charts(dfa, var1, var2, var3, titulo), repeat), linhas=len(dfa)),
+        result("figures_json_ano", escala,
+               measure(lambda: figures_json(dff, var1, var2, var3), repeat), linhas=len(dff)),
+    ]
+
+
+def make_app(df):
+    import dash
+
+    from callbacks import register_callbacks
+    from components import APRESENTACAO, PROJECOES, modulos_tab
+    from layout import make_layout
+    from snapshot import DataStore
+
+    app = dash.Dash(__name__, suppress_callback_exceptions=True)
+    store = DataStore(PROJECOES, df=df)
+    snap = store.current()
+    app.layout = make_layout(APRESENTACAO, modulos_tab(snap.anos, snap.ano_default, False,
+                                                       snap.cube.options("UF"),
+                                                       snap.cube.options("Secao_CNAE")))
+    register_callbacks(app, store, prewarm=False, clientside=False)
+    return app, store
+
+
+def modulo_request(client, modulo: str, ano: int, headers=None, nivel: str = "trimestral",
+                   uf=None, secao=None):
+    body = {
+        "output": "tab-content-modulo.children",
+        "outputs": {"id": "tab-content-modulo", "property": "children"},
+        "inputs": [
+            {"id": "tabs-top", "property": "value", "value": "modulos"},
+            {"id": "tabs-modulo", "property": "value", "value": modulo},
+            {"id": "filter-ano", "property": "value", "value": ano},
+            {"id": "filter-nivel", "property": "value", "value": nivel},
+            {"id": "filter-uf", "property": "value", "value": uf},
+            {"id": "filter-secao", "property": "value", "value": secao},
+        ],
+        "changedPropIds": ["filter-ano.value"],
+        "state": [{"id": "tab-content-modulo", "property": "children", "value": None}],
+    }
+    resp = client.post("/_dash-update-component", json=body, headers=headers or {})
+    # uma página de erro mediria latência e tamanho de outra coisa
+    if resp.status_code != 200:
+        raise RuntimeError(f"render_modulo ({modulo}, {ano}): HTTP {resp.status_code}")
+    return resp
+
+
+def bench_cube(escala: str, df, repeat: int) -> list:
+    # Detalhamento por UF/CNAE: consulta ao cubo x groupby sob demanda
+    from components import PROJECOES
+    from cube import Cube
+
+    if "UF" not in df.columns or "Secao_CNAE" not in df.columns:
+        return []
+    cube = Cube(df, PROJECOES)
+    uf, secao = cube.values["UF"][0], cube.values["Secao_CNAE"][-1]
+    cols = list(dict.fromkeys(c for spec in PROJECOES.values() for c in spec[:2]))
+
+    def groupby():
+        sel = df[(df["UF"] == uf) & (df["Secao_CNAE"] == secao)]
+        sel.groupby(["Ano", "Trimestre"])[cols].sum()
+
+    return [
+        result("cubo_montagem", escala, measure(lambda: Cube(df, PROJECOES), repeat), linhas=len(df)),
+        result("cubo_consulta", escala,
+               measure(lambda: cube.view("total", {"UF": uf, "Secao_CNAE": secao}), repeat * 10), linhas=len(df)),
+        result("groupby_sob_demanda", escala, measure(groupby, repeat * 10), linhas=len(df)),
+    ]
+
+
+def bench_callback(escala: str, df, repeat: int) -> list:
+    from components import MODULOS
+
+    app, store = make_app(df)
+    client = app.server.test_client()
+    anos = store.current().anos
+    combos = [(m, a) for m in MODULOS for a in anos]
+
+    # primeira requisição de cada combinação (cache de figuras frio)
+    cold = np.empty(len(combos))
+    payload = 0
+    for i, (m, a) in enumerate(combos):
+        start = time.perf_counter()
+        resp = modulo_request(client, m, a)
+        cold[i] = time.perf_counter() - start
+        payload = max(payload, len(resp.data))
+
+    state = {"i": 0}
+
+    def hot():
+        m, a = combos[state["i"] % len(combos)]
+        state["i"] += 1
+        modulo_request(client, m, a)
+
+    return [
+        result("callback_render_modulo_frio", escala, cold, combinacoes=len(combos), bytes_resposta=payload),
+        result("callback_render_modulo_quente", escala, measure(hot, repeat * 10),
+               combinacoes=len(combos), bytes_resposta=payload),
+    ]
+
+
+def check_compression(raw: bytes, gz) -> None:
+    # A resposta com Accept-Encoding: gzip tem de vir comprimida, menor e
+    # com o mesmo conteúdo da resposta sem compressão
+    encoding = gz.headers.get("Content-Encoding")
+    if encoding != "gzip":
+        raise RuntimeError(f"render_modulo sem compressão gzip (Content-Encoding: {encoding})")
+    if len(gz.data) >= len(raw):
+        raise RuntimeError(f"gzip não reduziu a resposta ({len(gz.data)} >= {len(raw)} bytes)")
+    if gzip.decompress(gz.data) != raw:
+        raise RuntimeError("resposta gzip difere da resposta sem compressão")
+
+
+def bench_payload(escala: str, df) -> list:
+    # Tamanho da resposta de render_modulo sem e com compressão
+    from webserver import brotli, compress_bytes, enable_compression
+
+    app, store = make_app(df)
+    enable_compression(app.server)
+    client = app.server.test_client()
+    ano = store.current().anos[-1]
+
+    raw = modulo_request(client, "total", ano, {"Accept-Encoding": "identity"}).data
+    gz = modulo_request(client, "total", ano, {"Accept-Encoding": "gzip"})
+    check_compression(raw, gz)
+    sizes = {"bytes_sem_compressao": len(raw), "bytes_gzip": len(gz.data),
+             "encoding_gzip": gz.headers.get("Content-Encoding")}
+    sizes["bytes_brotli"] = len(compress_bytes(raw, "br")) if brotli is not None else None
+
+    return [{"benchmark": "payload_render_modulo", "escala": escala, **sizes,
+             "razao_gzip": sizes["bytes_gzip"] / len(raw)}]
+
+
+def bench_microdata(escala: str, n_ufs: int, n_quarters: int, n_records: int, workdir: Path, repeat: int) -> list:
+    from aggregation import aggregate
+
+    # no máximo 4 arquivos trimestrais para manter o tempo de geração baixo
+    files = []
+    for i, (ano, tri) in enumerate(quarters(min(n_quarters, 4))):
+        path = workdir / f"PNADC_{tri:02d}{ano}-{escala}.txt"
+        write_microdata(path, n_records, ano, tri, n_ufs=n_ufs, seed=i)
+        files.append(path)
+
+    total = n_records * len(files)
+    size = sum(p.stat().st_size for p in files)
+    times = measure(lambda: aggregate(files), repeat, warmup=0)
+    return [
+        result("agregacao_microdados", escala, times, total,
+               registros=total, mb_por_s=size / 1e6 / float(times.mean())),
+    ]
+
+
+# Mede, num processo novo, o tempo até cada marco da inicialização do app:
+# importação, primeira resposta (/healthz), dados prontos (/readyz) e
+# primeiro layout
+_STARTUP_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter() - t0
+client = app.app.server.test_client()
+client.get("/healthz")
+t_first = time.perf_counter() - t0
+while client.get("/readyz").status_code != 200:
+    time.sleep(0.005)
+t_ready = time.perf_counter() - t0
+client.get("/_dash-layout")
+t_layout = time.perf_counter() - t0
+print(json.dumps({"importacao": t_import, "primeira_resposta": t_first,
+                  "pronto": t_ready, "primeiro_layout": t_layout}))
+"""
+
+
+def bench_startup(escala: str, df, workdir: Path, repeat: int) -> list:
+    # Inicialização normal x PNAD_LAZY_START, cada repetição num processo
+    # novo (o cache em data/cache é aquecido antes, como num restart)
+    csv = workdir / f"inicio-{escala}.csv"
+    df.drop(columns="Periodo").to_csv(csv, sep=";", decimal=",", index=False)
+    root = Path(__file__).resolve().parents[1]
+
+    def probe(lazy: bool) -> dict:
+        env = dict(os.environ, PNAD_DATA_PATH=str(csv), PNAD_LAZY_START="1" if lazy else "0",
+                   PNAD_METRICS="0")
+        out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE], cwd=root, env=env,
+                             capture_output=True, text=True, check=True)
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+    probe(False)
+    rows = []
+    for modo, lazy in (("normal", False), ("preguicoso", True)):
+        runs = [probe(lazy) for _ in range(repeat)]
+        for marco in ("importacao", "primeira_resposta", "pronto", "primeiro_layout"):
+            times = np.array([r[marco] for r in runs])
+            rows.append(result(f"inicio_{marco}_{modo}", escala, times, linhas=len(df)))
+    return rows
+
+
+def run(escalas, repeat: int, skip_microdata: bool = False):
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for escala in escalas:
+            n_ufs, n_quarters, n_secoes, n_records = ESCALAS[escala]
+            df = aggregated_frame(n_ufs, n_quarters, n_secoes)
+            yield from bench_load(escala, df, workdir, repeat)
+            yield from bench_memory(escala, df)
+            yield from bench_filter(escala, df, repeat)
+            yield from bench_cube(escala, df, repeat)
+            yield from bench_figures(escala, df, repeat)
+            yield from bench_callback(escala, df, repeat)
+            yield from bench_payload(escala, df)
+            yield from bench_startup(escala, df, workdir, repeat)
+            if not skip_microdata:
+                yield from bench_microdata(escala, n_ufs, n_quarters, n_records, workdir, repeat)
+
+
+def compare(old_path: str, new_path: str) -> None:
+    def read(path):
+        rows = [json.loads(line) for line in Path(path).read_text().splitlines() if line.strip()]
+        return {(r["benchmark"], r["escala"]): r for r in rows if "benchmark" in r}
+
+    old, new = read(old_path), read(new_path)
+    print(f"{'benchmark':40} {'escala':8} {'p50 antes':>12} {'p50 depois':>12} {'razão':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key]["p50"], new[key]["p50"]
+        ratio = b / a if a else float("nan")
+        flag = "  <-- mais lento" if ratio > 1.2 else ""
+        print(f"{key[0]:40} {key[1]:8} {a:12.6f} {b:12.6f} {ratio:8.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do painel PNAD.")
+    parser.add_argument("--escalas", nargs="+", default=["pequena"], choices=sorted(ESCALAS))
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--sem-microdados", action="store_true")
+    parser.add_argument("-o", "--output", help="arquivo JSON lines de saída (padrão: stdout)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"),
+                        help="compara dois arquivos de resultados")
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        compare(*args.comparar)
+        return
+
+    import warnings
+
+    warnings.filterwarnings("ignore")
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        out.write(json.dumps({"ambiente": versions()}) + "\n")
+        for row in run(args.escalas, args.repeticoes, args.sem_microdados):
+            out.write(json.dumps(row, default=float) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
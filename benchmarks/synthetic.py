@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import OUTPUT_COLUMNS, RATIOS, SECOES_CNAE
+from data_loader import normalize
+from microdata import parse_layout
+
+# UFs na ordem do código IBGE; Pernambuco (26) primeiro
+UFS = [26, 11, 12, 13, 14, 15, 16, 17, 21, 22, 23, 24, 25, 27, 28, 29,
+       31, 32, 33, 35, 41, 42, 43, 50, 51, 52, 53]
+
+# Primeira divisão CNAE de cada seção (V4013 = divisão * 1000 + classe)
+_DIVISAO_SECAO = [1, 5, 10, 35, 36, 41, 45, 49, 55, 58, 64, 68, 69, 77, 84, 85, 86, 90, 94, 97, 99]
+
+
+def quarters(n_quarters: int, first_year: int = 2012):
+    return [(first_year + i // 4, i % 4 + 1) for i in range(n_quarters)]
+
+
+def aggregated_frame(n_ufs: int = 1, n_quarters: int = 4, n_secoes: int = 1, seed: int = 0) -> pd.DataFrame:
+    # Tabela no formato de "Estatísticas - Agregadas", uma linha por
+    # Ano × Trimestre × UF × seção CNAE
+    rng = np.random.default_rng(seed)
+    periods = quarters(n_quarters)
+    ufs = UFS[:n_ufs]
+    secoes = list(SECOES_CNAE[:n_secoes])
+
+    idx = pd.MultiIndex.from_product([range(len(periods)), ufs, secoes], names=["p", "UF", "Secao_CNAE"])
+    df = idx.to_frame(index=False)
+    df["Ano"] = [periods[p][0] for p in df["p"]]
+    df["Trimestre"] = [periods[p][1] for p in df["p"]]
+    df = df.drop(columns="p")
+
+    n = len(df)
+    for col in OUTPUT_COLUMNS:
+        if col in RATIOS:
+            continue
+        scale = 3e6 if col.startswith("n_") else 5e9
+        df[col] = rng.uniform(0.5, 1.5, n) * scale / max(n_ufs * n_secoes, 1)
+    for col, (num, den) in RATIOS.items():
+        df[col] = df[num] / df[den]
+
+    if n_ufs == 1:
+        df = df.drop(columns="UF")
+    if n_secoes == 1:
+        df = df.drop(columns="Secao_CNAE")
+    return normalize(df)
+
+
+def _put(records: np.ndarray, col, values) -> None:
+    # valores mais curtos que a largura (ex.: "" = campo em branco) são
+    # completados com espaços, como nos arquivos do IBGE, e não com NUL
+    text = np.char.ljust(np.asarray(values, dtype=str), col.width)
+    text = np.asarray(text, dtype=f"S{col.width}")
+    records[:, col.start:col.stop] = text.view(np.uint8).reshape(len(records), col.width)
+
+
+def write_microdata(path, n_records: int, ano: int, trimestre: int, n_ufs: int = 1,
+                    replicates: int = 0, seed: int = 0, layout=None) -> None:
+    # Arquivo de largura fixa no layout do IBGE (só as colunas usadas)
+    layout = layout or parse_layout()
+    rng = np.random.default_rng(seed)
+    records = np.full((n_records, layout.lrecl + 1), ord(" "), dtype=np.uint8)
+    records[:, -1] = ord("\n")
+
+    peso = rng.uniform(50, 1500, n_records)
+    _put(records, layout["Ano"], np.full(n_records, str(ano)))
+    _put(records, layout["Trimestre"], np.full(n_records, str(trimestre)))
+    _put(records, layout["UF"], np.char.mod("%02d", rng.choice(UFS[:n_ufs], n_records)))
+    _put(records, layout["V1028"], np.char.mod("%15.8f", peso))
+    _put(records, layout["VD4002"], np.char.mod("%d", rng.choice([1, 2], n_records, p=[0.6, 0.4])))
+    _put(records, layout["VD4009"], np.char.mod("%02d", rng.integers(1, 11, n_records)))
+    divisao = rng.choice(_DIVISAO_SECAO, n_records)
+    _put(records, layout["V4013"], np.char.mod("%05d", divisao * 1000 + rng.integers(0, 999, n_records)))
+    renda = np.char.mod("%8d", rng.lognormal(7.5, 0.9, n_records).astype(np.int64))
+    renda[rng.random(n_records) < 0.1] = ""
+    _put(records, layout["VD4019"], renda)
+    _put(records, layout["VD4020"], renda)
+
+    for r in range(1, replicates + 1):
+        fator = rng.uniform(0.5, 1.5, n_records)
+        _put(records, layout[f"V1028{r:03d}"], np.char.mod("%15.8f", peso * fator))
+
+    records.tofile(path)
@@ -1,21 +1,148 @@
-import plotly.express as px
+import json
+
+import numpy as np
+import plotly.graph_objects as go
 from dash import html, dcc
 
-from styles import colors 
+from plotly.utils import PlotlyJSONEncoder as _PlotlyEncoder
+
+from config import MAX_POINTS, WEBGL_MIN_POINTS
+from instrumentation import timed
+from series import NIVEIS, NIVEL_PADRAO
+from sketch import distribution_columns
+from styles import colors, card_style_base, tab_style, tab_selected_style
+
+# Módulo -> (quantidade, renda total, renda média, título)
+MODULOS = {
+    "total": ("n_ocup_pond", "renda_total_pond",
+              "Renda Média_Total", "Total de Ocupados"),
+    "empregador": ("n_empregador_pond", "renda_empregador_pond",
+                   "Renda Média_empregador", "Empregadores"),
+    "conta_propria": ("n_conta_propria_pond", "renda_conta_propria_pond",
+                      "Renda Média_conta_propria", "Trabalhadores por Conta Própria"),
+}
+
+GRAPH_IDS = ("graph-quantidade", "graph-renda-total", "graph-renda-media")
+
+
+def module_distribution(var3) -> dict:
+    # Colunas de distribuição (decis, mediana, Gini) da renda média var3
+    return distribution_columns(var3.split("_", 1)[1])
+
+
+# Colunas lidas por módulo (projeções do DataIndex); as de distribuição
+# só existem em tabelas agregadas com --distribuicao
+PROJECOES = {
+    mod: [*spec[:3], *module_distribution(spec[2]).values()]
+    for mod, spec in MODULOS.items()
+}
+
+# Sequências de cores das barras (uma cor por ponto, em um único trace)
+BAR_COLORS = [
+    [colors["primary"], colors["secondary"], colors["accent"], colors["primary"]],
+    [colors["alert"], colors["secondary"], colors["accent"], colors["alert"]],
+]
+
+
+def error_bars(df_plot, var):
+    # Intervalo de confiança (colunas _ic_inf/_ic_sup), quando disponível
+    # (vazio nos roll-ups do cubo por UF/CNAE)
+    inf, sup = f"{var}_ic_inf", f"{var}_ic_sup"
+    if inf not in df_plot.columns or sup not in df_plot.columns or df_plot[inf].isna().all():
+        return {}
+    return {
+        "error_y": dict(
+            array=df_plot[sup] - df_plot[var],
+            arrayminus=df_plot[var] - df_plot[inf],
+        ),
+    }
+
+
+def _hover(var):
+    return f"Periodo=%{{x}}<br>{var}=%{{y}}<extra></extra>"
+
+
+# Eixos/legenda como o plotly.express montava (o assets/clientside.js
+# reproduz estes traces)
+_BASE_LAYOUT = dict(
+    xaxis=dict(anchor="y", domain=[0.0, 1.0]),
+    yaxis=dict(anchor="x", domain=[0.0, 1.0]),
+    legend=dict(tracegroupgap=0),
+)
+
+
+def _bar_figure(df_plot, var, palette):
+    # Um único trace de barras, com uma cor por ponto
+    return go.Figure(
+        go.Bar(
+            x=df_plot["Periodo"],
+            y=df_plot[var],
+            name="",
+            alignmentgroup="True",
+            offsetgroup="",
+            legendgroup="",
+            orientation="v",
+            showlegend=False,
+            textposition="auto",
+            marker=dict(color=point_colors(len(df_plot), palette), pattern=dict(shape="")),
+            hovertemplate=_hover(var),
+            xaxis="x",
+            yaxis="y",
+            **error_bars(df_plot, var),
+        ),
+        layout=dict(_BASE_LAYOUT, title=dict(text=var), barmode="relative"),
+    )
+
+
+def _line_figure(df_plot, var):
+    # Linha com marcadores; WebGL acima de WEBGL_MIN_POINTS pontos
+    webgl = len(df_plot) > WEBGL_MIN_POINTS
+    trace = go.Scattergl if webgl else go.Scatter
+    return go.Figure(
+        trace(
+            x=df_plot["Periodo"],
+            y=df_plot[var],
+            name="",
+            mode="lines+markers",
+            legendgroup="",
+            showlegend=False,
+            line=dict(color=colors["secondary"], width=3, dash="solid"),
+            marker=dict(color=colors["accent"], size=8, symbol="circle"),
+            hovertemplate=_hover(var),
+            xaxis="x",
+            yaxis="y",
+            **({} if webgl else {"orientation": "v"}),
+            **error_bars(df_plot, var),
+        ),
+        layout=dict(_BASE_LAYOUT, title=dict(text=var)),
+    )
+
+
+# Faixa D1–D9 da distribuição da renda (accent com transparência)
+FAIXA_DECIS = "rgba(68, 173, 102, 0.15)"
+
+
+def point_colors(n, palette):
+    return [palette[i % len(palette)] for i in range(n)]
+
 
 def layout_three_charts(df_plot, var1, var2, var3, title_prefix):
+    return charts_row(build_figures(df_plot, var1, var2, var3))
+
+
+def figures_json(df_plot, var1, var2, var3):
+    # Figuras serializadas, prontas para guardar em cache
+    with timed("figure_build"):
+        figures = build_figures(df_plot, var1, var2, var3)
+    with timed("figure_serialize"):
+        return [fig.to_json() for fig in figures]
+
+
+def build_figures(df_plot, var1, var2, var3):
     # Quantidade
-    fig1 = px.bar(
-        df_plot,
-        x="Periodo",
-        y=var1,
-        title=f"{var1}",
-        color="Periodo",
-        color_discrete_sequence=[colors["primary"], colors["secondary"],
-                                 colors["accent"], colors["primary"]],
-    )
+    fig1 = _bar_figure(df_plot, var1, BAR_COLORS[0])
     fig1.update_layout(
-        showlegend=True,
+        showlegend=False,
         xaxis_title="Período",
         yaxis_title=var1,
         title_x=0.5,
@@ -30,17 +157,9 @@ def layout_three_charts(df_plot, var1, var2, var3, title_prefix):
                       tickformat=".0f", separatethousands=True)
 
     # Renda total
-    fig2 = px.bar(
-        df_plot,
-        x="Periodo",
-        y=var2,
-        title=f"{var2}",
-        color="Periodo",
-        color_discrete_sequence=[colors["alert"], colors["secondary"],
-                                 colors["accent"], colors["alert"]],
-    )
+    fig2 = _bar_figure(df_plot, var2, BAR_COLORS[1])
     fig2.update_layout(
-        showlegend=True,
+        showlegend=False,
         xaxis_title="Período",
         yaxis_title=var2,
         title_x=0.5,
@@ -56,15 +175,8 @@ def layout_three_charts(df_plot, var1, var2, var3, title_prefix):
                       tickprefix="R$ ")
 
     # Renda média
-    fig3 = px.line(
-        df_plot,
-        x="Periodo",
-        y=var3,
-        markers=True,
-        title=f"{var3}",
-    )
-    fig3.update_traces(line=dict(color=colors["secondary"], width=3),
-                       marker=dict(color=colors["accent"], size=8))
+    fig3 = _line_figure(df_plot, var3)
+    add_distribution(fig3, df_plot, var3)
     fig3.update_layout(
         showlegend=True,
         xaxis_title="Período",
@@ -81,10 +193,105 @@ def layout_three_charts(df_plot, var1, var2, var3, title_prefix):
                       tickformat=".0f", separatethousands=True,
                       tickprefix="R$ ")
 
+    return fig1, fig2, fig3
+
+
+def add_distribution(fig, df_plot, var3):
+    # Faixa D1–D9 e mediana (com o Gini no hover), quando a tabela tem as
+    # colunas de distribuição
+    cols = module_distribution(var3)
+    if not all(c in df_plot.columns for c in (cols[0.1], cols[0.5], cols[0.9])):
+        return
+    if df_plot[cols[0.5]].isna().all():
+        # roll-up do cubo: quantis não se somam
+        return
+    x = df_plot["Periodo"].astype(str)
+    fig.add_scatter(x=x, y=df_plot[cols[0.9]], mode="lines", line=dict(width=0),
+                    showlegend=False, hoverinfo="skip")
+    fig.add_scatter(x=x, y=df_plot[cols[0.1]], mode="lines", line=dict(width=0),
+                    fill="tonexty", fillcolor=FAIXA_DECIS, name="D1–D9",
+                    hoverinfo="skip")
+    gini = df_plot[cols["gini"]] if cols["gini"] in df_plot.columns else None
+    fig.add_scatter(
+        x=x,
+        y=df_plot[cols[0.5]],
+        mode="lines+markers",
+        name="Mediana",
+        line=dict(color=colors["primary"], width=2, dash="dash"),
+        marker=dict(size=6),
+        customdata=gini,
+        hovertemplate="Periodo=%{x}<br>Mediana=%{y}"
+        + ("<br>Gini=%{customdata:.3f}" if gini is not None else "") + "<extra></extra>",
+    )
+    # média por cima da faixa
+    mean, *extra = fig.data
+    mean.update(name="Média", showlegend=True)
+    fig.data = (*extra, mean)
+
+
+def _json_list(values):
+    values = np.asarray(values, dtype=float)
+    return [None if np.isnan(v) else float(v) for v in values]
+
+
+def series_store(df):
+    # Séries por período de todos os módulos, em arrays colunares, para o
+    # modo de filtragem no navegador (assets/clientside.js)
+    data = {
+        "periodo": df["Periodo"].astype(str).tolist(),
+        "ano": df["Ano"].astype(int).tolist(),
+        "valores": {},
+        "ic": {},
+        "modulos": {},
+        "layouts": {},
+        "cores": {"barras": BAR_COLORS, "linha": colors["secondary"], "marcador": colors["accent"],
+                  "mediana": colors["primary"], "faixa": FAIXA_DECIS},
+        "limites": {"pontos": MAX_POINTS, "webgl": WEBGL_MIN_POINTS},
+        "distribuicao": {},
+        "template": None,
+    }
+
+    for mod, (var1, var2, var3, _) in MODULOS.items():
+        data["modulos"][mod] = [var1, var2, var3]
+        for var in (var1, var2, var3):
+            data["valores"][var] = _json_list(df[var])
+            if f"{var}_ic_inf" in df.columns and f"{var}_ic_sup" in df.columns:
+                data["ic"][var] = [_json_list(df[f"{var}_ic_inf"]), _json_list(df[f"{var}_ic_sup"])]
+        dist = module_distribution(var3)
+        if all(c in df.columns for c in (dist[0.1], dist[0.5], dist[0.9])):
+            data["distribuicao"][var3] = {
+                "d1": _json_list(df[dist[0.1]]),
+                "mediana": _json_list(df[dist[0.5]]),
+                "d9": _json_list(df[dist[0.9]]),
+                "gini": _json_list(df[dist["gini"]]) if dist["gini"] in df.columns else None,
+            }
+
+        # o layout vem do mesmo construtor usado no servidor; o template
+        # do plotly é enviado uma única vez
+        sample = df.iloc[:1].assign(Periodo=df["Periodo"].iloc[:1].astype(str))
+        layouts = []
+        for fig in build_figures(sample, var1, var2, var3):
+            layout = fig.to_plotly_json()["layout"]
+            data["template"] = layout.pop("template", data["template"])
+            layouts.append(layout)
+        data["layouts"][mod] = layouts
+
+    return json.loads(json.dumps(data, cls=_PlotlyEncoder))
+
+
+def charts_row(figures=None, ids=None):
+    # figures: objetos go.Figure ou JSON serializado (cache);
+    # ids: ids dos dcc.Graph, usados no modo de filtragem no navegador
+    if figures is None:
+        figures = [{}, {}, {}]
+    fig1, fig2, fig3 = [json.loads(f) if isinstance(f, str) else f for f in figures]
+    id1, id2, id3 = ids or (None, None, None)
+    graph_ids = [{"id": i} if i else {} for i in (id1, id2, id3)]
+
     return html.Div(
         [
             html.Div(
-                dcc.Graph(figure=fig1),
+                dcc.Graph(figure=fig1, **graph_ids[0]),
                 style={
                     "flex": "1",
                     "margin": "0 8px",
@@ -96,7 +303,7 @@ def layout_three_charts(df_plot, var1, var2, var3, title_prefix):
                 },
             ),
             html.Div(
-                dcc.Graph(figure=fig2),
+                dcc.Graph(figure=fig2, **graph_ids[1]),
                 style={
                     "flex": "1",
                     "margin": "0 8px",
@@ -108,7 +315,7 @@ def layout_three_charts(df_plot, var1, var2, var3, title_prefix):
                 },
             ),
             html.Div(
-                dcc.Graph(figure=fig3),
+                dcc.Graph(figure=fig3, **graph_ids[2]),
                 style={
                     "flex": "1",
                     "margin": "0 8px",
@@ -126,4 +333,177 @@ def layout_three_charts(df_plot, var1, var2, var3, title_prefix):
             "justifyContent": "space-between",
             "marginTop": "24px",
         },
-    )
\ No newline at end of file
+    )
+
+def apresentacao():
+    vars_info = [
+        ("n_ocup_pond",
+         "Número de ocupados ponderado (soma dos pesos amostrais V1028 para todas as pessoas ocupadas)."),
+        ("renda_total_pond",
+         "Soma ponderada da renda total do trabalho (trabalho principal + trabalho secundário + outros rendimentos de trabalho)."),
+        ("Renda Média_Total",
+         "Renda média do trabalho para o total de ocupados (renda_total_pond / n_ocup_pond)."),
+        ("n_empregador_pond",
+         "Número ponderado de empregadores (pessoas ocupadas na condição de empregador)."),
+        ("renda_empregador_pond",
+         "Renda total ponderada do trabalho dos empregadores."),
+        ("Renda Média_empregador",
+         "Renda média do trabalho dos empregadores (renda_empregador_pond / n_empregador_pond)."),
+        ("n_conta_propria_pond",
+         "Número ponderado de trabalhadores por conta própria."),
+        ("renda_conta_propria_pond",
+         "Renda total ponderada do trabalho dos trabalhadores por conta própria."),
+        ("Renda Média_conta_propria",
+         "Renda média do trabalho dos conta própria (renda_conta_propria_pond / n_conta_propria_pond)."),
+    ]
+
+    info_card = html.Div(
+        [
+            html.H2("Informações Gerais", style={"color": colors["primary"], "marginBottom": 10}),
+            html.P(
+                [
+                    "Esta base apresenta indicadores trimestrais da ",
+                    html.B("PNAD Contínua (IBGE)"),
+                    " para o estado de Pernambuco (UF=26), ",
+                    "focando a ocupação e a renda do trabalho.",
+                ]
+            ),
+            html.P(
+                [
+                    "As informações estão organizadas em três grupos: ",
+                    html.B("Total de Ocupados"),
+                    ", ",
+                    html.B("Empregadores"),
+                    " e ",
+                    html.B("Trabalhadores por Conta Própria"),
+                    ", sempre por trimestre e ano.",
+                ]
+            ),
+        ],
+        style=card_style_base,
+    )
+
+    # <details>: abre e fecha no navegador, sem callback
+    var_buttons = []
+    for var_name, var_desc in vars_info:
+        var_buttons.append(
+            html.Details(
+                [
+                    html.Summary(var_name, className="var-btn"),
+                    html.Div(var_desc, className="var-desc"),
+                ]
+            )
+        )
+
+    vars_card = html.Div(
+        [
+            html.H2("Definições das Variáveis", style={"color": colors["primary"], "marginBottom": 10}),
+            html.P(
+                "Clique em uma variável para visualizar a definição.",
+                style={"fontSize": "0.95rem", "color": "#555", "marginBottom": 12},
+            ),
+            html.Div(var_buttons),
+        ],
+        style=card_style_base,
+    )
+
+    return html.Div(
+        [
+            html.Div(info_card, style={"width": "100%"}),
+            html.Div(vars_card, style={"width": "100%"}),
+        ],
+        style={
+            "display": "flex",
+            "flexDirection": "column",
+            "alignItems": "stretch",
+            "marginTop": 20,
+            "gap": "20px",
+            "maxWidth": "900px",
+            "marginLeft": "auto",
+            "marginRight": "auto",
+        },
+    )
+
+
+# Conteúdo estático: montado uma vez, na importação
+APRESENTACAO = apresentacao()
+
+
+def _filter(label, component_id, options, width, placeholder=None, **kwargs):
+    return [
+        html.Label(
+            label,
+            style={
+                "fontWeight": "bold",
+                "marginLeft": "16px",
+                "marginRight": "8px",
+                "color": colors["primary"],
+            },
+        ),
+        dcc.Dropdown(
+            id=component_id,
+            options=options,
+            placeholder=placeholder,
+            style={"width": width},
+            **kwargs,
+        ),
+    ]
+
+
+def modulos_tab(anos, ano_default, clientside=False, ufs=None, secoes=None):
+    # ufs/secoes: opções de detalhamento (Cube.options); sem elas, os
+    # seletores ficam desabilitados
+    return html.Div(
+        [
+            dcc.Tabs(
+                id="tabs-modulo",
+                value="total",
+                children=[
+                    dcc.Tab(label="Total de Ocupados", value="total", style=tab_style, selected_style=tab_selected_style),
+                    dcc.Tab(label="Empregadores", value="empregador", style=tab_style, selected_style=tab_selected_style),
+                    dcc.Tab(label="Conta Própria", value="conta_propria", style=tab_style, selected_style=tab_selected_style),
+                ],
+            ),
+            html.Div(
+                [
+                    html.Label(
+                        "Ano",
+                        style={
+                            "fontWeight": "bold",
+                            "marginRight": "8px",
+                            "color": colors["primary"],
+                        },
+                    ),
+                    dcc.Dropdown(
+                        id="filter-ano",
+                        options=[{"label": str(a), "value": int(a)} for a in anos],
+                        value=ano_default,
+                        placeholder="Todos os anos",
+                        style={"width": "180px"},
+                    ),
+                    *_filter(
+                        "Agregação",
+                        "filter-nivel",
+                        [{"label": label, "value": nivel} for nivel, label in NIVEIS.items()],
+                        "260px",
+                        value=NIVEL_PADRAO,
+                        clearable=False,
+                    ),
+                    *_filter("UF", "filter-uf", ufs or [], "140px", "Todas", disabled=not ufs),
+                    *_filter("Seção CNAE", "filter-secao", secoes or [], "320px", "Todas",
+                             disabled=not secoes),
+                ],
+                style={
+                    "display": "flex",
+                    "flexWrap": "wrap",
+                    "alignItems": "center",
+                    "gap": "10px",
+                    "padding": "12px 0 8px 0",
+                },
+            ),
+            html.Div(
+                charts_row(ids=GRAPH_IDS) if clientside else None,
+                id="tab-content-modulo",
+            ),
+        ]
+    )
@@ -0,0 +1,51 @@
+import os
+
+
+def _flag(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "sim", "on")
+
+
+# Cache LRU de figuras por (módulo, ano)
+FIGURE_CACHE_SIZE = int(os.environ.get("PNAD_FIGURE_CACHE_SIZE", "64"))
+PREWARM_FIGURES = _flag("PNAD_PREWARM_FIGURES")
+
+# Filtragem de ano/módulo no navegador (séries enviadas uma vez em dcc.Store)
+CLIENTSIDE_FILTERING = _flag("PNAD_CLIENTSIDE")
+
+# Fonte dos dados: planilha/CSV ou diretório do store particionado (ingest.py)
+DATA_PATH = os.environ.get("PNAD_DATA_PATH") or None
+# Intervalo mínimo (s) entre verificações de mudança na fonte
+RELOAD_INTERVAL = float(os.environ.get("PNAD_RELOAD_INTERVAL", "30"))
+# Recarga em segundo plano (thread por processo); desligada, a verificação
+# acontece na própria requisição
+RELOAD_WATCHER = _flag("PNAD_RELOAD_WATCHER", True)
+
+# Inicialização rápida: o servidor sobe sem dados e a carga acontece no
+# watcher (em segundo plano) ou na primeira requisição; /readyz indica
+# quando os dados estão prontos
+LAZY_START = _flag("PNAD_LAZY_START")
+
+# Instrumentação dos callbacks e endpoint /metrics (somente local)
+METRICS = _flag("PNAD_METRICS")
+METRICS_PUBLIC = _flag("PNAD_METRICS_PUBLIC")
+
+# Compressão gzip/brotli das respostas acima de COMPRESS_MIN_BYTES
+COMPRESS = _flag("PNAD_COMPRESS", True)
+COMPRESS_MIN_BYTES = int(os.environ.get("PNAD_COMPRESS_MIN_BYTES", "1024"))
+
+# Download da tabela de indicadores em /dados.csv|parquet|arrow (downloads.py)
+DOWNLOADS = _flag("PNAD_DOWNLOADS", True)
+
+# Frame compacto em memória (inteiros pequenos, categóricos, float32)
+COMPACT_FRAME = _flag("PNAD_COMPACT")
+
+# Dataset compartilhado entre workers (Arrow IPC mapeado, ver shared.py)
+SHARED_PATH = os.environ.get("PNAD_SHARED_PATH") or None
+
+# Máximo de pontos por gráfico (blocos de períodos consecutivos acima
+# disso) e, acima de WEBGL_MIN_POINTS, linha renderizada em WebGL
+MAX_POINTS = int(os.environ.get("PNAD_MAX_POINTS", "120"))
+WEBGL_MIN_POINTS = int(os.environ.get("PNAD_WEBGL_POINTS", "60"))
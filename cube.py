@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+# Dimensões de detalhamento do cubo, quando presentes no frame
+DIMENSOES = ("UF", "Secao_CNAE")
+
+# Colunas de erro amostral de cada medida (aggregation.py, com replicates)
+SUFIXOS_ERRO = ("_se", "_ic_inf", "_ic_sup")
+
+UF_SIGLAS = {
+    11: "RO", 12: "AC", 13: "AM", 14: "RR", 15: "PA", 16: "AP", 17: "TO",
+    21: "MA", 22: "PI", 23: "CE", 24: "RN", 25: "PB", 26: "PE", 27: "AL", 28: "SE", 29: "BA",
+    31: "MG", 32: "ES", 33: "RJ", 35: "SP",
+    41: "PR", 42: "SC", 43: "RS",
+    50: "MS", 51: "MT", 52: "GO", 53: "DF",
+}
+
+SECOES_NOMES = {
+    "A": "Agropecuária",
+    "B": "Indústrias extrativas",
+    "C": "Indústrias de transformação",
+    "D": "Eletricidade e gás",
+    "E": "Água, esgoto e resíduos",
+    "F": "Construção",
+    "G": "Comércio",
+    "H": "Transporte e armazenagem",
+    "I": "Alojamento e alimentação",
+    "J": "Informação e comunicação",
+    "K": "Atividades financeiras",
+    "L": "Atividades imobiliárias",
+    "M": "Atividades profissionais e científicas",
+    "N": "Atividades administrativas",
+    "O": "Administração pública",
+    "P": "Educação",
+    "Q": "Saúde e serviços sociais",
+    "R": "Artes, cultura e recreação",
+    "S": "Outras atividades de serviços",
+    "T": "Serviços domésticos",
+    "U": "Organismos internacionais",
+}
+
+
+def dimension_label(dim: str, value) -> str:
+    if dim == "UF":
+        return UF_SIGLAS.get(int(value), str(value))
+    if dim == "Secao_CNAE" and value in SECOES_NOMES:
+        return f"{value} – {SECOES_NOMES[value]}"
+    return str(value)
+
+
+class Cube:
+    """Cubo de somas aditivas por UF × seção CNAE × período.
+
+    Cada dimensão ganha uma posição 0 com o total das demais, então todos
+    os 2^d níveis (roll-ups) ficam pré-calculados num único array denso e
+    qualquer combinação de filtros é uma indexação, sem groupby. As
+    médias (var3 = var2 / var1 de cada projeção) são recalculadas a
+    partir das somas.
+
+    As demais colunas das projeções (decis, mediana, Gini) e o erro
+    amostral de cada medida (SUFIXOS_ERRO) não são aditivos: ficam só nas
+    células sem total (todos os filtros escolhidos, ou frame sem quebras)
+    e vazios nos roll-ups.
+    """
+
+    def __init__(self, df: pd.DataFrame, projections: dict):
+        self.dims = [d for d in DIMENSOES if d in df.columns]
+        self.projections = {name: list(cols[:3]) for name, cols in projections.items()}
+        self.columns = {
+            name: [c for col in cols for c in (col, *(col + s for s in SUFIXOS_ERRO))]
+            for name, cols in projections.items()
+        }
+        self.measures = list(dict.fromkeys(c for cols in self.projections.values() for c in cols[:2]))
+        additive = {c for cols in self.projections.values() for c in cols}
+        self.extras = list(dict.fromkeys(
+            c for cols in self.columns.values() for c in cols if c in df.columns and c not in additive
+        ))
+
+        key = df["Ano"].to_numpy(dtype=np.int64) * 10 + df["Trimestre"].to_numpy(dtype=np.int64)
+        periods, period_pos = np.unique(key, return_inverse=True)
+        self.anos = periods // 10
+        self.trimestres = periods % 10
+        self.periodos = np.array([f"{t}T{a}" for a, t in zip(self.anos, self.trimestres)], dtype=object)
+        starts = np.flatnonzero(np.r_[True, self.anos[1:] != self.anos[:-1]]) if len(periods) else []
+        stops = np.r_[starts[1:], len(periods)] if len(periods) else []
+        self.slices = {int(self.anos[i]): slice(int(i), int(j)) for i, j in zip(starts, stops)}
+
+        self.values = {}
+        positions = []
+        for dim in self.dims:
+            col = df[dim]
+            raw = col.to_numpy(dtype=np.int64) if dim == "UF" else col.astype(str).to_numpy()
+            uniq, pos = np.unique(raw, return_inverse=True)
+            self.values[dim] = uniq.tolist()
+            positions.append(pos + 1)
+
+        shape = tuple(len(self.values[d]) + 1 for d in self.dims) + (len(periods),)
+        flat = np.ravel_multi_index((*positions, period_pos), shape) if len(df) else np.array([], dtype=np.int64)
+        size = int(np.prod(shape))
+
+        sums = np.empty(shape + (len(self.measures),))
+        for m, col in enumerate(self.measures):
+            x = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            sums[..., m] = np.bincount(flat, weights=np.nan_to_num(x), minlength=size).reshape(shape)
+        counts = np.bincount(flat, minlength=size).reshape(shape)
+
+        leaf = np.full((size, len(self.extras)), np.nan)
+        if self.extras:
+            leaf[flat] = df[self.extras].to_numpy(dtype=np.float64, na_value=np.nan)
+        leaf.flags.writeable = False
+        self.leaf = leaf.reshape(shape + (len(self.extras),))
+
+        # roll-ups: a posição 0 de cada eixo recebe a soma das demais,
+        # eixo a eixo, o que cobre todas as combinações de totais
+        for axis in range(len(self.dims)):
+            idx = [slice(None)] * sums.ndim
+            idx[axis] = 0
+            rest = [slice(None)] * sums.ndim
+            rest[axis] = slice(1, None)
+            sums[tuple(idx)] = sums[tuple(rest)].sum(axis=axis)
+            counts[tuple(idx[:-1])] = counts[tuple(rest[:-1])].sum(axis=axis)
+
+        sums.flags.writeable = False
+        self.sums = sums
+        self.present = counts > 0
+
+    def options(self, dim: str) -> list:
+        return [{"label": dimension_label(dim, v), "value": v} for v in self.values.get(dim, [])]
+
+    def _position(self, dim: str, value) -> int | None:
+        if value is None:
+            return 0
+        values = self.values.get(dim)
+        if values is None:
+            return None
+        try:
+            return values.index(int(value) if dim == "UF" else str(value)) + 1
+        except (ValueError, TypeError):
+            return None
+
+    def table(self, filters: dict | None = None, ano: int | None = None) -> pd.DataFrame:
+        # Uma linha por período com todas as medidas, para os filtros
+        # {dimensão: valor} (ausente ou None = total)
+        filters = filters or {}
+        pos = tuple(self._position(d, filters.get(d)) for d in self.dims)
+        rows = slice(None) if ano is None else self.slices.get(int(ano), slice(0, 0))
+        if None in pos:
+            rows = slice(0, 0)
+            pos = (0,) * len(self.dims)
+
+        block = self.sums[pos][rows]
+        present = self.present[pos][rows]
+        data = {
+            "Ano": self.anos[rows],
+            "Trimestre": self.trimestres[rows],
+            "Periodo": self.periodos[rows],
+        }
+        for m, col in enumerate(self.measures):
+            data[col] = np.where(present, block[:, m], np.nan)
+        for var1, var2, var3 in self.projections.values():
+            with np.errstate(divide="ignore", invalid="ignore"):
+                data[var3] = np.where(data[var1] != 0, data[var2] / data[var1], np.nan)
+        leaf = self.leaf[pos][rows]
+        for e, col in enumerate(self.extras):
+            data[col] = leaf[:, e]
+        return pd.DataFrame(data)
+
+    def view(self, name: str, filters: dict | None = None, ano: int | None = None) -> pd.DataFrame:
+        table = self.table(filters, ano)
+        return table[["Ano", "Trimestre", "Periodo", *(c for c in self.columns[name] if c in table.columns)]]
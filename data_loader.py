@@ -1,3 +1,10 @@
+import hashlib
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
@@ -6,26 +13,192 @@ BASE_DIR = Path(__file__).resolve().parent
 DATA_PATH = BASE_DIR / "data" / "Tabela1-Renda Total da Forca de Trabalho e Renda total das Famílias Produtoras Por Cnae.xlsx"
 SHEET_NAME = "Estatísticas - Agregadas"
 
-def load_data(path: str | Path = DATA_PATH, sheet_name: str = SHEET_NAME) -> pd.DataFrame:
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = BASE_DIR / "data" / "cache"
+CACHE_VERSION = "1"
+
+num_cols = [
+    "n_ocup_pond",
+    "renda_total_pond",
+    "Renda Média_Total",
+    "n_empregador_pond",
+    "renda_empregador_pond",
+    "Renda Média_empregador",
+    "n_conta_propria_pond",
+    "renda_conta_propria_pond",
+    "Renda Média_conta_propria",
+]
+
+
+@contextmanager
+def atomic_write(target: str | Path, mode: int | None = None):
+    # Entrega um caminho temporário no mesmo diretório (oculto, com "."); ao
+    # sair sem erro, aplica mode e troca pelo destino com os.replace. Em
+    # qualquer falha o temporário é removido e o destino fica intacto.
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def file_sha256(path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_fingerprint(path: str | Path, sheet_name: str = SHEET_NAME) -> str:
+    # Caminho + mtime + tamanho + hash do conteúdo
+    p = Path(path).resolve()
+    st = p.stat()
+    key = f"{CACHE_VERSION}|{p}|{sheet_name}|{st.st_mtime_ns}|{st.st_size}|{file_sha256(p)}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def source_version(path: str | Path = DATA_PATH) -> str:
+    # Verificação barata de mudança (mtime + tamanho), sem ler o arquivo;
+    # para um store particionado, a versão é a do catálogo
+    p = Path(path)
+    if p.is_dir():
+        from ingest import store_version
+
+        return store_version(p)
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        return ""
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    # Impressão digital da fonte (load_data) ou, na falta dela, do conteúdo
+    fingerprint = df.attrs.get("fingerprint")
+    if fingerprint:
+        return fingerprint
+    hashed = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha256(hashed.tobytes() + "|".join(df.columns).encode()).hexdigest()
+
+
+def _cache_path(path: str | Path, fingerprint: str, cache_dir: Path) -> Path:
+    stem = hashlib.sha1(str(Path(path).resolve()).encode()).hexdigest()[:12]
+    return cache_dir / f"{stem}-{fingerprint[:16]}.parquet"
+
+
+def _read_cache(cache_file: Path, fingerprint: str) -> pd.DataFrame | None:
+    if not cache_file.exists():
+        return None
+    try:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(cache_file)
+        meta = table.schema.metadata or {}
+        if meta.get(b"pnad_fingerprint", b"").decode() != fingerprint:
+            return None
+        return table.to_pandas()
+    except Exception:
+        # cache corrompido ou ilegível: volta a ler a planilha
+        return None
+
+
+def _write_cache(df: pd.DataFrame, cache_file: Path, fingerprint: str) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[b"pnad_fingerprint"] = fingerprint.encode()
+    table = table.replace_schema_metadata(meta)
+
+    # escrita atômica: vários workers podem tentar gravar ao mesmo tempo
+    with atomic_write(cache_file) as tmp:
+        pq.write_table(table, tmp)
+
+    # remove versões antigas da mesma fonte
+    prefix = cache_file.name.split("-")[0]
+    for old in cache_file.parent.glob(f"{prefix}-*.parquet"):
+        if old != cache_file:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+def load_data(
+    path: str | Path = DATA_PATH,
+    sheet_name: str = SHEET_NAME,
+    cache: bool = True,
+    cache_dir: str | Path = CACHE_DIR,
+    compact: bool = False,
+) -> pd.DataFrame:
+    df = _load_normalized(path, sheet_name, cache, cache_dir)
+    if compact:
+        df = compact_frame(df)
+    return df
+
+
+def query_microdata(
+    columns: list,
+    filters: dict | None = None,
+    store_dir: str | Path | None = None,
+) -> pd.DataFrame:
+    # Consulta ad hoc nos microdados convertidos por microstore.py, p.ex.
+    # query_microdata(["V2007", "VD4019"], {"Ano": 2021, "UF": 26, "VD4009": [1, 2]})
+    from microstore import MICROSTORE_DIR, query
+
+    return query(columns, filters, store_dir or MICROSTORE_DIR)
+
+
+def _load_normalized(path, sheet_name, cache, cache_dir) -> pd.DataFrame:
+    if Path(path).is_dir():
+        # store particionado gerado por ingest.py
+        from ingest import load_store
+
+        return load_store(path)
+
+    if not cache:
+        df = read_source(path, sheet_name)
+        df.attrs["fingerprint"] = source_fingerprint(path, sheet_name)
+        return df
+
+    fingerprint = source_fingerprint(path, sheet_name)
+    cache_file = _cache_path(path, fingerprint, Path(cache_dir))
+
+    df = _read_cache(cache_file, fingerprint)
+    if df is None:
+        df = read_source(path, sheet_name)
+        try:
+            _write_cache(df, cache_file, fingerprint)
+        except OSError:
+            pass
+
+    df.attrs["fingerprint"] = fingerprint
+    return df
+
+
+def read_source(path: str | Path = DATA_PATH, sheet_name: str = SHEET_NAME) -> pd.DataFrame:
     p = str(path).lower()
     if p.endswith(".xlsx") or p.endswith(".xls"):
         df = pd.read_excel(path, sheet_name=sheet_name)
     else:
         df = pd.read_csv(path, sep=";", decimal=",")
 
-    df.columns = df.columns.str.strip()
+    return normalize(df)
 
-    num_cols = [
-        "n_ocup_pond",
-        "renda_total_pond",
-        "Renda Média_Total",
-        "n_empregador_pond",
-        "renda_empregador_pond",
-        "Renda Média_empregador",
-        "n_conta_propria_pond",
-        "renda_conta_propria_pond",
-        "Renda Média_conta_propria",
-    ]
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = df.columns.str.strip()
 
     for c in num_cols:
         if c in df.columns:
@@ -46,6 +219,132 @@ def load_data(path: str | Path = DATA_PATH, sheet_name: str = SHEET_NAME) -> pd.
 
     df["Periodo"] = df["Trimestre"].astype(str) + "T" + df["Ano"].astype(str)
     df = df[df["Periodo"].notna()].copy()
-    df = df.sort_values(["Ano", "Trimestre"])
+    df = df.sort_values(["Ano", "Trimestre"]).reset_index(drop=True)
+
+    # Periodo categórico, na ordem cronológica
+    df["Periodo"] = pd.Categorical(df["Periodo"], categories=df["Periodo"].unique(), ordered=True)
+
+    return df
+
+# float32 guarda 24 bits de mantissa: erro relativo de arredondamento de
+# no máximo 2**-24 (~6e-8) por valor, ou seja, o erro absoluto cresce com a
+# magnitude. Nas somas de renda (~5e9 R$) chega a ~300 R$; nas contagens
+# (~3e6 pessoas), ~0,2 pessoa; nas rendas médias (~3e3 R$), ~0,0002 R$.
+# Só vão para float32 as colunas cujo maior erro absoluto fique dentro de
+# FLOAT32_ATOL (meia unidade: meio real ou meia pessoa).
+FLOAT32_ATOL = 0.5
+
+# sufixo do fingerprint do frame compactado: caches de figuras e ETags não
+# se misturam com os do frame em float64
+COMPACT_SUFFIX = "-compacto"
+
+
+def memory_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Ano/Trimestre/UF como inteiros pequenos, Periodo e Secao_CNAE
+    # categóricos e medidas em float32 quando a precisão permite
+    before = memory_bytes(df)
+    out = df.copy()
+
+    for col, dtype in (("Ano", np.int16), ("Trimestre", np.int8), ("UF", np.int8)):
+        if col in out.columns and out[col].notna().all():
+            out[col] = out[col].to_numpy(dtype=np.int64).astype(dtype)
+
+    for col in ("Periodo", "Secao_CNAE"):
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("category")
+
+    for col in out.columns:
+        if out[col].dtype != np.float64:
+            continue
+        x64 = out[col].to_numpy()
+        x32 = x64.astype(np.float32)
+        finite = np.isfinite(x64)
+        with np.errstate(over="ignore", invalid="ignore"):
+            err = np.abs(x32[finite].astype(np.float64) - x64[finite])
+        if not err.size or err.max() <= FLOAT32_ATOL:
+            out[col] = x32
+
+    out.attrs = dict(df.attrs)
+    fingerprint = out.attrs.get("fingerprint")
+    if fingerprint and not fingerprint.endswith(COMPACT_SUFFIX):
+        out.attrs["fingerprint"] = fingerprint + COMPACT_SUFFIX
+    after = memory_bytes(out)
+    out.attrs["memoria"] = {"antes": before, "depois": after}
+    logger.info("Frame compactado: %.1f KiB -> %.1f KiB", before / 1024, after / 1024)
+    return out
+
+
+def _int_array(s: pd.Series) -> np.ndarray:
+    if isinstance(s.dtype, pd.api.extensions.ExtensionDtype):
+        return s.to_numpy(dtype=np.int64)
+    return s.to_numpy()
+
+
+def _float_array(s: pd.Series) -> np.ndarray:
+    # mantém float32 do frame compactado, sem converter para float64
+    arr = s.to_numpy()
+    if arr.dtype.kind == "f":
+        return arr
+    return s.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _readonly(values) -> np.ndarray:
+    # arrays já somente leitura (ex.: mapeados de shared.py) não são copiados
+    arr = np.asarray(values)
+    if arr.flags.writeable:
+        arr = arr.copy()
+        arr.flags.writeable = False
+    return arr
+
+
+class DataIndex:
+    """Índice somente leitura do frame carregado.
+
+    O frame é ordenado por (Ano, Trimestre) e cada ano vira uma fatia
+    contígua de linhas. Cada módulo tem uma projeção só com as colunas
+    usadas nos gráficos, montada sobre arrays NumPy não graváveis; view()
+    devolve fatias dessas projeções sem cópia.
+    """
+
+    def __init__(self, df: pd.DataFrame, projections: dict):
+        # normalize() já ordena; só reordena (copiando) quando necessário
+        order = np.lexsort((_int_array(df["Trimestre"]), _int_array(df["Ano"])))
+        if (np.diff(order) < 0).any():
+            df = df.iloc[order]
+        self.fingerprint = frame_fingerprint(df)
+
+        anos = _int_array(df["Ano"])
+        self.anos, starts = np.unique(anos, return_index=True)
+        stops = np.r_[starts[1:], len(anos)]
+        self.slices = {int(a): slice(int(i), int(j)) for a, i, j in zip(self.anos, starts, stops)}
+
+        base = {
+            "Ano": _readonly(anos),
+            "Trimestre": _readonly(_int_array(df["Trimestre"])),
+            "Periodo": _readonly(df["Periodo"].astype(str).to_numpy(dtype=object)),
+        }
+        self.projections = {}
+        for name, cols in projections.items():
+            data = dict(base)
+            for col in cols:
+                for c in (col, f"{col}_ic_inf", f"{col}_ic_sup"):
+                    if c in df.columns:
+                        data[c] = _readonly(_float_array(df[c]))
+            # copy=False: um bloco por coluna, sem consolidar (e sem copiar)
+            self.projections[name] = pd.DataFrame(data, copy=False)
+
+    def rows(self, ano: int | None) -> slice:
+        if ano is None:
+            return slice(None)
+        return self.slices.get(int(ano), slice(0, 0))
+
+    def view(self, name: str, ano: int | None = None) -> pd.DataFrame:
+        return self.projections[name].iloc[self.rows(ano)]
+
 
-    return df
\ No newline at end of file
+def build_index(df: pd.DataFrame, projections: dict) -> DataIndex:
+    return DataIndex(df, projections)
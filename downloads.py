@@ -0,0 +1,138 @@
+"""Download da tabela de indicadores (CSV, Parquet ou Arrow IPC).
+
+    GET /dados.csv?modulo=total&ano=2021&uf=26&secao=C
+    GET /dados.parquet   GET /dados.arrow
+
+Todos os parâmetros são opcionais (ausente = todos / total). A resposta é
+gerada em blocos de DOWNLOAD_CHUNK_ROWS linhas, sem montar o arquivo
+inteiro em memória, e leva um ETag derivado do fingerprint do snapshot e
+dos parâmetros: requisições repetidas com If-None-Match recebem 304 sem
+tocar nos dados até que a fonte mude.
+"""
+import hashlib
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Response, abort, request
+
+from callbacks import drill_filters
+from components import PROJECOES
+from cube import SUFIXOS_ERRO
+
+DOWNLOAD_CHUNK_ROWS = 10_000
+# sobe quando o conteúdo gerado para os mesmos dados mudar
+DOWNLOAD_VERSION = "2"
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def download_etag(fingerprint: str, fmt: str, params: tuple) -> str:
+    key = "|".join([DOWNLOAD_VERSION, fingerprint, fmt, *map(str, params)])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def download_table(snap, modulo=None, ano=None, uf=None, secao=None):
+    # Tabela por período (cubo para UF/CNAE; frame original sem quebras)
+    filters = drill_filters(uf, secao)
+    if any(dim not in snap.cube.dims for dim in filters):
+        abort(400, "detalhamento por UF/CNAE indisponível nesta base")
+    table = snap.table(filters)
+    if ano is not None:
+        table = table[table["Ano"].to_numpy() == ano]
+    if modulo is not None:
+        keep = {"Ano", "Trimestre", "Periodo"}
+        keep.update(c + s for c in PROJECOES[modulo] for s in ("", *SUFIXOS_ERRO))
+        cols = [c for c in table.columns if c in keep]
+        table = table[cols]
+    return table.reset_index(drop=True)
+
+
+def _csv_chunks(df, chunk_rows):
+    # mesmo formato lido por data_loader.read_source (sep=";", decimal=",")
+    yield df.iloc[:0].to_csv(sep=";", decimal=",", index=False)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(sep=";", decimal=",", index=False, header=False)
+
+
+class _Sink(io.RawIOBase):
+    # Destino de escrita que só acumula bytes até o próximo drain()
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _arrow_chunks(df, chunk_rows, fmt):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = _Sink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, table.schema)
+        write = lambda t: writer.write_table(t, row_group_size=chunk_rows)  # noqa: E731
+    else:
+        writer = pa.ipc.new_stream(sink, table.schema)
+        write = writer.write_table
+    for start in range(0, max(table.num_rows, 1), chunk_rows):
+        write(table.slice(start, chunk_rows))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        abort(400, f"{name} inválido")
+
+
+def register_downloads(server, store, chunk_rows: int = DOWNLOAD_CHUNK_ROWS) -> None:
+    # store: snapshot.DataStore (sempre o snapshot corrente)
+    @server.route("/dados.<fmt>")
+    def pnad_download(fmt):
+        if fmt not in FORMATS:
+            abort(404)
+        modulo = request.args.get("modulo") or None
+        if modulo is not None and modulo not in PROJECOES:
+            abort(404)
+        ano = _int_arg("ano")
+        uf = _int_arg("uf")
+        secao = request.args.get("secao") or None
+
+        snap = store.current()
+        etag = download_etag(snap.fingerprint, fmt, (modulo, ano, uf, secao))
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+
+        df = download_table(snap, modulo, ano, uf, secao)
+        if fmt == "csv":
+            body = _csv_chunks(df, chunk_rows)
+        else:
+            body = _arrow_chunks(df, chunk_rows, fmt)
+        name = "_".join(str(p) for p in ("pnad", modulo or "todos", ano or "todos", uf, secao) if p is not None)
+        headers["Content-Disposition"] = f'attachment; filename="{name}.{fmt}"'
+        return Response(body, content_type=FORMATS[fmt], headers=headers)
@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from config import FIGURE_CACHE_SIZE
+
+
+class FigureCache:
+    """Cache LRU limitado das figuras serializadas.
+
+    As chaves são prefixadas pela impressão digital dos dados: quando a
+    impressão digital muda, todo o conteúdo anterior é descartado.
+    """
+
+    def __init__(self, maxsize: int = FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, fingerprint: str, key: Hashable, build: Callable):
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self._data.clear()
+                self.fingerprint = fingerprint
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        # monta fora do lock; duas requisições simultâneas podem montar a
+        # mesma figura, mas o resultado é idêntico
+        value = build()
+
+        with self._lock:
+            if fingerprint == self.fingerprint and self.maxsize > 0:
+                self._data[key] = value
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.fingerprint = None
+
+    def keys(self) -> list:
+        # das menos para as mais usadas recentemente
+        with self._lock:
+            return list(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
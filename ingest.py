@@ -0,0 +1,189 @@
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+
+from aggregation import aggregate_files
+from data_loader import BASE_DIR, atomic_write, file_sha256, normalize
+from microdata import parse_layout
+
+STORE_DIR = BASE_DIR / "data" / "store"
+CATALOG_NAME = "catalog.json"
+
+
+def partition_key(ano: int, trimestre: int) -> str:
+    return f"{int(ano)}-{int(trimestre)}"
+
+
+def partition_file(ano: int, trimestre: int) -> str:
+    return f"ano={int(ano)}/trimestre={int(trimestre)}/part.parquet"
+
+
+class Catalog:
+    """Registro das partições (Ano, Trimestre) já processadas.
+
+    Cada partição guarda o arquivo de origem, seu checksum e o Parquet
+    agregado correspondente no diretório do store.
+    """
+
+    def __init__(self, store_dir: str | Path = STORE_DIR):
+        self.store_dir = Path(store_dir)
+        self.path = self.store_dir / CATALOG_NAME
+        self.version = 0
+        self.partitions = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.version = data.get("version", 0)
+            self.partitions = data.get("partitions", {})
+
+    def save(self, bump: bool = True) -> None:
+        # bump=False para atualizações só de metadados (ex.: mtime), que não
+        # mudam nenhuma partição: a versão do store continua a mesma
+        if bump:
+            self.version += 1
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        payload = {"version": self.version, "partitions": self.partitions}
+        with atomic_write(self.path) as tmp:
+            Path(tmp).write_text(json.dumps(payload, indent=2, sort_keys=True), encoding="utf-8")
+
+    def sources(self) -> dict:
+        # arquivo de origem -> entradas do catálogo geradas por ele
+        out = {}
+        for key, entry in self.partitions.items():
+            out.setdefault(entry["source"], []).append(entry)
+        return out
+
+
+def _unchanged(entries: list, st: os.stat_result) -> bool:
+    return bool(entries) and all(
+        e["size"] == st.st_size and e["mtime_ns"] == st.st_mtime_ns for e in entries
+    )
+
+
+def _write_partition(df: pd.DataFrame, target: Path) -> None:
+    with atomic_write(target) as tmp:
+        df.to_parquet(tmp, index=False)
+
+
+def ingest(
+    paths: Iterable[str | Path],
+    store_dir: str | Path = STORE_DIR,
+    replicates: int = 0,
+    force: bool = False,
+    workers: int | None = 1,
+    distribution: bool = False,
+) -> list:
+    # Agrega só os arquivos novos ou alterados e grava uma partição
+    # por (Ano, Trimestre). Retorna as chaves das partições atualizadas.
+    catalog = Catalog(store_dir)
+    layout = parse_layout()
+    updated = []
+    todo = []
+
+    for path in paths:
+        source = str(Path(path).resolve())
+        st = os.stat(source)
+        entries = catalog.sources().get(source, [])
+
+        if not force and _unchanged(entries, st):
+            continue
+
+        checksum = file_sha256(source)
+        if not force and entries and all(e["sha256"] == checksum for e in entries):
+            # só mudou o mtime (ex.: cópia do arquivo)
+            for e in entries:
+                e["mtime_ns"] = st.st_mtime_ns
+            catalog.save(bump=False)
+            continue
+
+        todo.append((source, st, checksum))
+
+    if not todo:
+        return updated
+
+    aggs = aggregate_files([t[0] for t in todo], replicates=replicates, layout=layout, workers=workers,
+                           distribution=distribution)
+    for (source, st, checksum), agg in zip(todo, aggs):
+        df = agg.to_frame()
+        produced = set()
+        for (ano, trimestre), part in df.groupby(["Ano", "Trimestre"], sort=True):
+            key = partition_key(ano, trimestre)
+            rel = partition_file(ano, trimestre)
+            _write_partition(part.drop(columns="Periodo"), catalog.store_dir / rel)
+            catalog.partitions[key] = {
+                "ano": int(ano),
+                "trimestre": int(trimestre),
+                "source": source,
+                "sha256": checksum,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "file": rel,
+                "rows": int(len(part)),
+            }
+            produced.add(key)
+            updated.append(key)
+        # trimestres que este arquivo gerava antes e não gera mais
+        for key, e in list(catalog.partitions.items()):
+            if e["source"] == source and key not in produced:
+                del catalog.partitions[key]
+                (catalog.store_dir / e["file"]).unlink(missing_ok=True)
+                updated.append(key)
+        # grava o catálogo a cada arquivo escrito
+        catalog.save()
+
+    return updated
+
+
+def store_version(store_dir: str | Path = STORE_DIR) -> str:
+    # Versão do catálogo, que só sobe quando alguma partição muda (o
+    # catálogo é pequeno; regravá-lo só com novos mtimes não conta)
+    path = Path(store_dir) / CATALOG_NAME
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return ""
+    return str(data.get("version", 0))
+
+
+def load_store(store_dir: str | Path = STORE_DIR) -> pd.DataFrame:
+    catalog = Catalog(store_dir)
+    if not catalog.partitions:
+        raise FileNotFoundError(f"Nenhuma partição no store {catalog.store_dir}.")
+
+    keys = sorted(catalog.partitions, key=lambda k: tuple(map(int, k.split("-"))))
+    frames = [pd.read_parquet(catalog.store_dir / catalog.partitions[k]["file"]) for k in keys]
+    df = normalize(pd.concat(frames, ignore_index=True))
+
+    # a versão distingue reingestões do mesmo arquivo com outras opções
+    checksums = "|".join([str(catalog.version), *(f"{k}:{catalog.partitions[k]['sha256']}" for k in keys)])
+    df.attrs["fingerprint"] = hashlib.sha256(checksums.encode()).hexdigest()
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestão incremental de trimestres da PNAD Contínua.")
+    parser.add_argument("arquivos", nargs="+", help="arquivos PNADC_xxxxxx.txt")
+    parser.add_argument("--store", default=str(STORE_DIR), help="diretório do store particionado")
+    parser.add_argument("--replicas", type=int, default=0, metavar="N",
+                        help="pesos replicados para erro-padrão")
+    parser.add_argument("--forcar", action="store_true", help="reprocessa mesmo sem mudanças")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos em paralelo (0 = todos os núcleos)")
+    parser.add_argument("--distribuicao", action="store_true",
+                        help="decis, mediana e Gini da renda (sketch de quantis)")
+    args = parser.parse_args(argv)
+
+    updated = ingest(args.arquivos, args.store, replicates=args.replicas, force=args.forcar,
+                     workers=args.workers, distribution=args.distribuicao)
+    if updated:
+        print("Partições atualizadas: " + ", ".join(updated))
+    else:
+        print("Nada a fazer: todos os trimestres já estão no store.")
+
+
+if __name__ == "__main__":
+    main()
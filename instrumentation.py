@@ -0,0 +1,176 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+from flask import Response, abort, request
+
+WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+LOCAL_ADDRS = {"127.0.0.1", "::1", "localhost"}
+
+# tempos por fase da chamada corrente (ex.: figure_build)
+_phases = contextvars.ContextVar("pnad_phases", default=None)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> int:
+    # RSS atual (Linux); 0 quando /proc não está disponível
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+@contextmanager
+def timed(phase: str):
+    # Acumula o tempo do bloco na fase indicada da chamada instrumentada;
+    # fora de uma chamada instrumentada não faz nada
+    phases = _phases.get()
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - start
+
+
+class _Series:
+    # Janela móvel + totais acumulados (para _sum/_count do Prometheus)
+
+    def __init__(self, window: int):
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.values.append(value)
+        self.total += value
+        self.count += 1
+
+    def quantiles(self) -> dict:
+        if not self.values:
+            return {q: float("nan") for q in QUANTILES}
+        qs = np.quantile(np.fromiter(self.values, dtype=float), QUANTILES)
+        return dict(zip(QUANTILES, qs.tolist()))
+
+
+class Metrics:
+    """Métricas por callback: tempo total, tempo por fase, bytes da
+    resposta e variação de RSS, com percentis sobre uma janela móvel."""
+
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _get(self, metric: str, labels: tuple) -> _Series:
+        key = (metric, labels)
+        if key not in self._series:
+            self._series[key] = _Series(self.window)
+        return self._series[key]
+
+    def record(self, callback: str, wall: float, phases: dict, payload: int, mem_delta: int) -> None:
+        with self._lock:
+            self._get("seconds", (("callback", callback),)).add(wall)
+            self._get("response_bytes", (("callback", callback),)).add(payload)
+            self._get("memory_delta_bytes", (("callback", callback),)).add(mem_delta)
+            for phase, seconds in phases.items():
+                self._get("phase_seconds", (("callback", callback), ("phase", phase))).add(seconds)
+
+    def summary(self) -> dict:
+        out = {}
+        with self._lock:
+            for (metric, labels), series in sorted(self._series.items()):
+                name = ",".join(v for _, v in labels)
+                entry = out.setdefault(metric, {}).setdefault(name, {})
+                entry["count"] = series.count
+                entry["mean"] = series.total / series.count if series.count else float("nan")
+                for q, v in series.quantiles().items():
+                    entry[f"p{int(q * 100)}"] = v
+        return out
+
+    def prometheus(self) -> str:
+        help_text = {
+            "seconds": "Tempo total de execução do callback.",
+            "phase_seconds": "Tempo por fase dentro do callback.",
+            "response_bytes": "Tamanho da resposta JSON do callback.",
+            "memory_delta_bytes": "Variação de RSS do processo durante o callback.",
+        }
+        lines = []
+        with self._lock:
+            by_metric = {}
+            for (metric, labels), series in sorted(self._series.items()):
+                by_metric.setdefault(metric, []).append((labels, series))
+
+            for metric, items in by_metric.items():
+                name = f"pnad_callback_{metric}"
+                lines.append(f"# HELP {name} {help_text[metric]}")
+                lines.append(f"# TYPE {name} summary")
+                for labels, series in items:
+                    base = ",".join(f'{k}="{v}"' for k, v in labels)
+                    for q, v in series.quantiles().items():
+                        lines.append(f'{name}{{{base},quantile="{q}"}} {v!r}')
+                    lines.append(f"{name}_sum{{{base}}} {series.total!r}")
+                    lines.append(f"{name}_count{{{base}}} {series.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _wrap(func, name: str, registry: Metrics):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        phases = {}
+        token = _phases.set(phases)
+        mem_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - start
+            _phases.reset(token)
+        payload = len(result.encode("utf-8")) if isinstance(result, str) else 0
+        registry.record(name, wall, phases, payload, rss_bytes() - mem_before)
+        return result
+
+    wrapper.pnad_instrumented = True
+    return wrapper
+
+
+def instrument(app, registry: Metrics = metrics, public: bool = False) -> Metrics:
+    # Envolve todos os callbacks Python já registrados no app e expõe
+    # /metrics (Prometheus) e /metrics/summary (JSON com percentis)
+    for spec in app.callback_map.values():
+        func = spec.get("callback")
+        if func is None or getattr(func, "pnad_instrumented", False):
+            continue
+        spec["callback"] = _wrap(func, getattr(func, "__name__", "callback"), registry)
+
+    def check_local():
+        if not public and request.remote_addr not in LOCAL_ADDRS:
+            abort(403)
+
+    server = app.server
+
+    @server.route("/metrics")
+    def pnad_metrics():
+        check_local()
+        return Response(registry.prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @server.route("/metrics/summary")
+    def pnad_metrics_summary():
+        check_local()
+        return Response(json.dumps(registry.summary(), indent=2), mimetype="application/json")
+
+    return registry
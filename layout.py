@@ -1,7 +1,41 @@
 from dash import dcc, html
 from styles import colors, tab_style, tab_selected_style
+from webserver import asset_url
 
-def make_layout():
+TITULO = "PNAD Contínua – Ocupação e Renda em Pernambuco"
+PAGE_TITLE = "PNAD – Ocupação e Renda"
+
+# Página base do Dash (app.py e exportação estática)
+INDEX_STRING = """
+<!DOCTYPE html>
+<html>
+    <head>
+        {%metas%}
+        <title>{%title%}</title>
+        {%favicon%}
+        {%css%}
+        <style>
+            body {
+                font-family: "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
+            }
+        </style>
+    </head>
+    <body>
+        {%app_entry%}
+        <footer>
+            {%config%}
+            {%scripts%}
+            {%renderer%}
+        </footer>
+    </body>
+</html>
+"""
+
+
+def make_layout(apresentacao=None, modulos=None, extra=None):
+    # apresentacao/modulos: conteúdo das abas de topo (troca de aba no
+    # navegador, sem callback); extra: componentes adicionais na raiz
+    # (ex.: dcc.Store de séries)
     return html.Div(
         [
             html.Div(
@@ -10,7 +44,7 @@ def make_layout():
                     html.Div(
                         [
                             html.Img(
-                                src="/assets/logo-ifpe-branco.png",
+                                src=asset_url("logo-ifpe-branco.png"),
                                 style={
                                     "height": "40px",
                                     "marginLeft": "20px",
@@ -18,6 +52,7 @@ def make_layout():
                                 },
                             ),
                             html.H1(
+                                TITULO,
                                 id="titulo-dashboard",
                                 style={
                                     "flex": "1",
@@ -52,12 +87,14 @@ def make_layout():
                         value="apresentacao",
                         children=[
                             dcc.Tab(
+                                html.Div(apresentacao, style={"padding": "20px"}),
                                 label="Apresentação",
                                 value="apresentacao",
                                 style=tab_style,
                                 selected_style=tab_selected_style,
                             ),
                             dcc.Tab(
+                                html.Div(modulos, style={"padding": "20px"}),
                                 label="Módulos",
                                 value="modulos",
                                 style=tab_style,
@@ -65,7 +102,6 @@ def make_layout():
                             ),
                         ],
                     ),
-                    html.Div(id="tab-content-top", style={"padding": "20px"}),
                 ],
                 style={
                     "backgroundColor": colors["card"],
@@ -76,6 +112,7 @@ def make_layout():
                     "margin": "0 auto",
                 },
             ),
+            *(extra or []),
         ],
         style={
             "backgroundColor": colors["background"],
@@ -0,0 +1,227 @@
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+
+LAYOUT_PATH = BASE_DIR / "data" / "layout_pnad.txt"
+
+# Colunas usadas pelos indicadores do painel
+DEFAULT_COLUMNS = ["Ano", "Trimestre", "UF", "V1028", "V4013", "VD4002", "VD4009", "VD4019"]
+
+CHUNK_ROWS = 50_000
+MATRIX_BLOCK_ROWS = 512
+
+MISSING_CODE = -1
+
+_INPUT_RE = re.compile(r"^@(\d+)\s+(\w+)\s+(\$?)(\d+)\.")
+_LRECL_RE = re.compile(r"lrecl\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class Column(NamedTuple):
+    name: str
+    start: int  # posição 0-based no registro
+    width: int
+    is_char: bool
+
+    @property
+    def stop(self) -> int:
+        return self.start + self.width
+
+
+class Layout(NamedTuple):
+    columns: dict
+    lrecl: int
+
+    def __getitem__(self, name: str) -> Column:
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise KeyError(f"Coluna '{name}' não existe no layout da PNAD.") from None
+
+
+def parse_layout(path: str | Path = LAYOUT_PATH) -> Layout:
+    # Lê o programa SAS do IBGE (INFILE + "@pos nome largura.")
+    text = Path(path).read_text(encoding="latin-1")
+
+    m = _LRECL_RE.search(text)
+    lrecl = int(m.group(1)) if m else 0
+
+    columns = {}
+    for line in text.splitlines():
+        m = _INPUT_RE.match(line.strip())
+        if not m:
+            continue
+        pos, name, dollar, width = m.groups()
+        columns[name] = Column(name, int(pos) - 1, int(width), dollar == "$")
+
+    if not columns:
+        raise ValueError(f"Nenhuma coluna encontrada no layout {path}.")
+
+    end = max(c.stop for c in columns.values())
+    return Layout(columns, max(lrecl, end))
+
+
+def _record_length(path: str | Path, lrecl: int) -> int:
+    # Tamanho físico do registro, incluindo o fim de linha (\n ou \r\n)
+    with open(path, "rb") as f:
+        head = f.read(lrecl + 2)
+    nl = head.find(b"\n")
+    if nl < 0:
+        return len(head) if len(head) <= lrecl else lrecl
+    return nl + 1
+
+
+def _digits(block: np.ndarray):
+    # block: (..., largura) de bytes ASCII
+    d = block.astype(np.int64) - ord("0")
+    is_digit = (d >= 0) & (d <= 9)
+    return np.where(is_digit, d, 0), is_digit
+
+
+def decode_int(block: np.ndarray) -> np.ndarray:
+    # Códigos ($) -> int64; campos em branco ou não numéricos viram MISSING_CODE
+    digits, is_digit = _digits(block)
+    is_blank = block == ord(" ")
+    right = np.cumsum(is_digit[..., ::-1], axis=-1)[..., ::-1] - is_digit
+    values = (digits * np.power(10, right, dtype=np.int64)).sum(axis=-1)
+    valid = (is_digit | is_blank).all(axis=-1) & is_digit.any(axis=-1)
+    return np.where(valid, values, MISSING_CODE)
+
+
+def decode_float(block: np.ndarray) -> np.ndarray:
+    # Valores numéricos (sem $), com ponto decimal explícito; branco -> NaN
+    digits, is_digit = _digits(block)
+    is_dot = block == ord(".")
+    is_neg = (block == ord("-")).any(axis=-1)
+
+    # expoente de cada dígito = quantidade de dígitos à sua direita
+    right = np.cumsum(is_digit[..., ::-1], axis=-1)[..., ::-1] - is_digit
+    integer = (digits * np.power(10, right, dtype=np.int64)).sum(axis=-1)
+
+    width = block.shape[-1]
+    has_dot = is_dot.any(axis=-1)
+    dot_pos = np.where(has_dot, is_dot.argmax(axis=-1), width)
+    after_dot = np.arange(width) > dot_pos[..., None]
+    decimals = (is_digit & after_dot).sum(axis=-1)
+
+    values = integer / np.power(10.0, decimals)
+    values = np.where(is_neg, -values, values)
+    return np.where(is_digit.any(axis=-1), values, np.nan)
+
+
+def decode_column(records: np.ndarray, col: Column, as_text: bool = False) -> np.ndarray:
+    block = records[:, col.start:col.stop]
+    if as_text:
+        return block.copy().view(f"S{col.width}").ravel()
+    if col.is_char:
+        return decode_int(block)
+    return decode_float(block)
+
+
+def decode_matrix(records: np.ndarray, cols: list) -> np.ndarray:
+    # Colunas numéricas de mesma largura -> matriz (n, k).
+    # Se forem contíguas no registro (ex.: pesos replicados), decodifica
+    # todas de uma vez como um bloco (n, k, largura).
+    width = cols[0].width
+    contiguous = all(
+        c.width == width and c.start == cols[0].start + i * width and not c.is_char
+        for i, c in enumerate(cols)
+    )
+    if not contiguous:
+        return np.column_stack([decode_column(records, c) for c in cols])
+    n, k = len(records), len(cols)
+    out = np.empty((n, k))
+    # em sub-blocos de linhas para limitar os temporários (n, k, largura)
+    for i in range(0, n, MATRIX_BLOCK_ROWS):
+        rows = records[i:i + MATRIX_BLOCK_ROWS, cols[0].start:cols[-1].stop]
+        out[i:i + MATRIX_BLOCK_ROWS] = decode_float(rows.reshape(len(rows), k, width))
+    return out
+
+
+def replicate_weights(layout: Layout, n: int, prefix: str = "V1028") -> list:
+    # Nomes dos n primeiros pesos replicados (V1028001, V1028002, ...)
+    names = [f"{prefix}{i:03d}" for i in range(1, n + 1)]
+    missing = [name for name in names if name not in layout.columns]
+    if missing:
+        raise KeyError(f"Pesos replicados ausentes no layout: {missing[:3]}...")
+    return names
+
+
+def iter_chunks(
+    path: str | Path,
+    columns: Iterable[str] = DEFAULT_COLUMNS,
+    chunk_rows: int = CHUNK_ROWS,
+    layout: Layout | None = None,
+    text_columns: Iterable[str] = (),
+    matrix_columns: dict | None = None,
+    start: int = 0,
+    stop: int | None = None,
+) -> Iterator[dict]:
+    # Lê o arquivo de microdados em blocos de chunk_rows registros,
+    # decodificando apenas as colunas pedidas (memória constante).
+    # matrix_columns: {"nome": [colunas]} devolve uma matriz (n, k) por nome.
+    # start/stop: intervalo de registros [start, stop) a ler.
+    layout = layout or parse_layout()
+    cols = [layout[c] for c in columns]
+    text_columns = set(text_columns)
+    matrices = {name: [layout[c] for c in names] for name, names in (matrix_columns or {}).items()}
+
+    reclen = _record_length(path, layout.lrecl)
+    needed = max(c.stop for c in cols + [c for m in matrices.values() for c in m])
+    buf = bytearray(chunk_rows * reclen)
+    remaining = None if stop is None else max(stop - start, 0) * reclen
+
+    with open(path, "rb") as f:
+        f.seek(start * reclen)
+        while True:
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                n = f.readinto(memoryview(buf)[:min(len(buf), remaining)])
+                remaining -= n
+            else:
+                n = f.readinto(buf)
+            if not n:
+                break
+            rows = n // reclen
+            tail = n - rows * reclen
+            # último registro pode vir sem quebra de linha
+            if tail >= needed:
+                buf[n:n + reclen - tail] = b" " * (reclen - tail)
+                rows += 1
+            if rows == 0:
+                break
+            records = np.frombuffer(buf, dtype=np.uint8, count=rows * reclen).reshape(rows, reclen)
+            chunk = {c.name: decode_column(records, c, c.name in text_columns) for c in cols}
+            for name, mcols in matrices.items():
+                chunk[name] = decode_matrix(records, mcols)
+            yield chunk
+            if n < len(buf) and remaining is None:
+                break
+
+
+def count_records(path: str | Path, layout: Layout | None = None) -> int:
+    layout = layout or parse_layout()
+    reclen = _record_length(path, layout.lrecl)
+    size = Path(path).stat().st_size
+    # último registro pode vir sem quebra de linha
+    return -(-size // reclen)
+
+
+def record_ranges(path: str | Path, split_records: int, layout: Layout | None = None) -> list:
+    # Fatias [start, stop) alinhadas a registros, de tamanho fixo
+    total = count_records(path, layout)
+    return [(i, min(i + split_records, total)) for i in range(0, total, split_records)]
+
+
+def read_columns(path: str | Path, columns: Iterable[str] = DEFAULT_COLUMNS, **kwargs) -> dict:
+    # Conveniência: concatena todos os blocos (use só para arquivos pequenos)
+    columns = list(columns)
+    parts = {c: [] for c in columns}
+    for chunk in iter_chunks(path, columns, **kwargs):
+        for c in columns:
+            parts[c].append(chunk[c])
+    return {c: np.concatenate(v) if v else np.array([]) for c, v in parts.items()}
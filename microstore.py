@@ -0,0 +1,337 @@
+"""Microdados da PNAD em Parquet particionado, para consultas ad hoc.
+
+Conversão única dos arquivos de largura fixa (colunas de
+data/layout_pnad.txt) num dataset Parquet particionado por
+Ano/Trimestre/UF, com estatísticas min/max por row group e os códigos
+categóricos ($) como inteiros pequenos em páginas de dicionário. As consultas
+usam pyarrow.dataset: diretórios fora do filtro nem são abertos e os
+row groups são descartados pelas estatísticas, lendo só as colunas
+pedidas.
+
+Uso:
+
+    python -m microstore converter data/PNADC_012021.txt --workers 0
+    python -m microstore consulta --por V2007 V2010 --filtro Ano=2021 UF=26 --valor VD4019
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from data_loader import BASE_DIR, atomic_write
+from microdata import CHUNK_ROWS, MISSING_CODE, iter_chunks, parse_layout, record_ranges
+
+MICROSTORE_DIR = BASE_DIR / "data" / "microdados"
+MANIFEST_NAME = "manifest.json"
+PARTITIONS = ["Ano", "Trimestre", "UF"]
+ROW_GROUP_ROWS = 32_768
+# fatias maiores que as da agregação: cada uma gera seus próprios arquivos
+SPLIT_RECORDS = 262_144
+REPLICATE_PREFIX = "V1028"
+
+
+def store_columns(layout, replicates: bool = False) -> list:
+    # Todas as colunas do layout; pesos replicados (V1028001...) só se pedidos
+    return [
+        name for name in layout.columns
+        if replicates or not (name.startswith(REPLICATE_PREFIX) and len(name) > len(REPLICATE_PREFIX))
+    ]
+
+
+def arrow_type(col) -> pa.DataType:
+    # Códigos ($) no menor inteiro que comporta a largura (o Parquet ainda
+    # os grava com dicionário por row group); valores em float64
+    if not col.is_char:
+        return pa.float64()
+    if col.width <= 2:
+        return pa.int8()
+    if col.width <= 4:
+        return pa.int16()
+    if col.width <= 9:
+        return pa.int32()
+    return pa.int64()
+
+
+def _column(values: np.ndarray, type: pa.DataType) -> pa.Array:
+    # códigos em branco (MISSING_CODE) viram nulos no Parquet
+    if pa.types.is_integer(type):
+        return pa.array(values, mask=values == MISSING_CODE, type=type)
+    return pa.array(values, type=type)
+
+
+def _source_key(path: str) -> str:
+    st = os.stat(path)
+    return hashlib.sha256(f"{path}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+class _PartitionWriter:
+    # Acumula linhas por partição e grava row groups de ROW_GROUP_ROWS
+
+    def __init__(self, target: Path, schema: pa.Schema, row_group_rows: int):
+        self.target = target
+        self._file = ExitStack()
+        self.tmp = self._file.enter_context(atomic_write(target))
+        self.writer = pq.ParquetWriter(self.tmp, schema, write_statistics=True, use_dictionary=True)
+        self.row_group_rows = row_group_rows
+        self.pending = []
+        self.rows = 0
+
+    def add(self, table: pa.Table) -> None:
+        self.pending.append(table)
+        self.rows += len(table)
+        if self.rows >= self.row_group_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.writer.write_table(pa.concat_tables(self.pending), row_group_size=self.row_group_rows)
+            self.pending, self.rows = [], 0
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+        self._file.close()
+
+    def abort(self, exc: BaseException) -> None:
+        # descarta o temporário sem tocar no destino
+        self.writer.close()
+        self._file.__exit__(type(exc), exc, exc.__traceback__)
+
+
+def _convert_range(task) -> list:
+    path, start, stop, columns, store_dir, key, layout, chunk_rows, row_group_rows = task
+    data_columns = [c for c in columns if c not in PARTITIONS]
+    schema = pa.schema([(c, arrow_type(layout[c])) for c in data_columns])
+    writers = {}
+    try:
+        for chunk in iter_chunks(path, PARTITIONS + data_columns, chunk_rows=chunk_rows,
+                                 layout=layout, start=start, stop=stop):
+            part = np.stack([chunk[c] for c in PARTITIONS], axis=1)
+            groups, inverse = np.unique(part, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            for g, values in enumerate(groups):
+                rows = np.flatnonzero(inverse == g)
+                table = pa.table(
+                    [_column(chunk[c][rows], schema.field(c).type) for c in data_columns],
+                    schema=schema,
+                )
+                pkey = tuple(int(v) for v in values)
+                if pkey not in writers:
+                    rel = "/".join(f"{p}={v}" for p, v in zip(PARTITIONS, pkey))
+                    target = Path(store_dir) / rel / f"part-{key}-{start:09d}.parquet"
+                    writers[pkey] = _PartitionWriter(target, schema, row_group_rows)
+                writers[pkey].add(table)
+    except BaseException as exc:
+        for w in writers.values():
+            w.abort(exc)
+        raise
+    for w in writers.values():
+        w.close()
+    return [str(w.target.relative_to(store_dir)) for w in writers.values()]
+
+
+def _load_manifest(store_dir: Path) -> dict:
+    path = store_dir / MANIFEST_NAME
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def _save_manifest(store_dir: Path, manifest: dict) -> None:
+    with atomic_write(store_dir / MANIFEST_NAME) as tmp:
+        Path(tmp).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def convert(
+    paths: Iterable[str | Path],
+    store_dir: str | Path = MICROSTORE_DIR,
+    columns: Iterable[str] | None = None,
+    replicates: bool = False,
+    force: bool = False,
+    workers: int | None = 1,
+    chunk_rows: int = CHUNK_ROWS,
+    row_group_rows: int = ROW_GROUP_ROWS,
+    split_records: int = SPLIT_RECORDS,
+    layout=None,
+) -> list:
+    # Converte os arquivos novos ou alterados; devolve os que foram convertidos
+    from aggregation import resolve_workers
+
+    layout = layout or parse_layout()
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    columns = list(columns) if columns else store_columns(layout, replicates)
+    columns = PARTITIONS + [c for c in columns if c not in PARTITIONS]
+    manifest = _load_manifest(store_dir)
+
+    converted = []
+    for path in paths:
+        source = str(Path(path).resolve())
+        key = _source_key(source)
+        entry = manifest.get(source)
+        if not force and entry and entry["key"] == key and entry["columns"] == columns:
+            continue
+
+        # cada conversão escreve num diretório oculto (ignorado por dataset)
+        # e só move os arquivos para as partições quando todas as fatias
+        # terminam: uma falha no meio não deixa linhas duplicadas
+        staging = store_dir / f".conversao-{key}"
+        shutil.rmtree(staging, ignore_errors=True)
+        tasks = [
+            (source, start, stop, columns, staging, key, layout, chunk_rows, row_group_rows)
+            for start, stop in record_ranges(source, split_records, layout)
+        ]
+        try:
+            n_workers = min(resolve_workers(workers), max(len(tasks), 1))
+            if n_workers == 1:
+                files = [f for task in tasks for f in _convert_range(task)]
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                    files = [f for part in pool.map(_convert_range, tasks) for f in part]
+            for rel in files:
+                (store_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+                os.replace(staging / rel, store_dir / rel)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        # arquivos da versão anterior deste arquivo de origem
+        for old in set((entry or {}).get("files", [])) - set(files):
+            try:
+                os.remove(store_dir / old)
+            except FileNotFoundError:
+                pass
+        manifest[source] = {"key": key, "columns": columns, "files": sorted(files)}
+        _save_manifest(store_dir, manifest)
+        converted.append(source)
+    return converted
+
+
+def dataset(store_dir: str | Path = MICROSTORE_DIR) -> ds.Dataset:
+    # temporários de escrita começam com "." (data_loader.atomic_write)
+    return ds.dataset(str(store_dir), format="parquet", partitioning="hive",
+                      ignore_prefixes=[".", "_", MANIFEST_NAME])
+
+
+def filter_expression(filters: dict | None) -> ds.Expression | None:
+    # {coluna: valor | [valores] | (mínimo, máximo)}; intervalos fechados
+    expr = None
+    for col, value in (filters or {}).items():
+        field = ds.field(col)
+        if isinstance(value, tuple):
+            lo, hi = value
+            cond = (field >= lo) & (field <= hi)
+        elif isinstance(value, (list, set)):
+            cond = field.isin(list(value))
+        else:
+            cond = field == value
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+_NULLABLE_INTS = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}
+
+
+def query(columns: Iterable[str], filters: dict | None = None,
+          store_dir: str | Path = MICROSTORE_DIR) -> pd.DataFrame:
+    # Só as colunas pedidas, só as partições/row groups que passam no filtro;
+    # códigos em branco chegam como <NA> (inteiros anuláveis do pandas)
+    table = dataset(store_dir).to_table(columns=list(columns), filter=filter_expression(filters))
+    return table.to_pandas(types_mapper=_NULLABLE_INTS.get)
+
+
+def _numpy(array: pa.Array) -> np.ndarray:
+    # nulos dos códigos voltam a MISSING_CODE, como em microdata.decode_int
+    if pa.types.is_integer(array.type) and array.null_count:
+        array = pc.fill_null(array, MISSING_CODE)
+    return array.to_numpy(zero_copy_only=False)
+
+
+def scan(columns: Iterable[str], filters: dict | None = None,
+         store_dir: str | Path = MICROSTORE_DIR, batch_rows: int = CHUNK_ROWS) -> Iterator[dict]:
+    # Mesmo formato de microdata.iter_chunks ({coluna: array}), para
+    # alimentar aggregation.Aggregator.update sem reler o arquivo bruto
+    columns = list(columns)
+    batches = dataset(store_dir).to_batches(columns=columns, filter=filter_expression(filters),
+                                            batch_size=batch_rows)
+    for batch in batches:
+        if batch.num_rows:
+            yield {c: _numpy(batch.column(c)) for c in columns}
+
+
+def weighted_table(by: Iterable[str], filters: dict | None = None, values: Iterable[str] = (),
+                   weight: str = "V1028", store_dir: str | Path = MICROSTORE_DIR) -> pd.DataFrame:
+    # População estimada (soma dos pesos) e somas/médias ponderadas por grupo
+    by, values = list(by), list(values)
+    df = query(by + [weight] + values, filters, store_dir)
+    data = {"pessoas_pond": df[weight]}
+    for col in values:
+        valid = df[col].notna()
+        data[f"{col}_pond"] = df[col].fillna(0) * df[weight]
+        data[f"{col}_peso"] = df[weight].where(valid, 0)
+    grouped = pd.DataFrame(data).groupby([df[c] for c in by], sort=True, dropna=False).sum()
+    for col in values:
+        grouped[f"{col}_media"] = grouped[f"{col}_pond"] / grouped.pop(f"{col}_peso")
+    return grouped.reset_index()
+
+
+def _parse_filter(text: str):
+    col, _, raw = text.partition("=")
+    if ".." in raw:
+        lo, hi = raw.split("..", 1)
+        return col, (float(lo) if "." in lo else int(lo), float(hi) if "." in hi else int(hi))
+    parts = [int(v) if v.lstrip("-").isdigit() else v for v in raw.split(",")]
+    return col, parts if len(parts) > 1 else parts[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microdados da PNAD em Parquet particionado.")
+    parser.add_argument("--store", default=str(MICROSTORE_DIR), help="diretório do dataset")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    conv = sub.add_parser("converter", help="converte arquivos PNADC_xxxxxx.txt")
+    conv.add_argument("arquivos", nargs="+")
+    conv.add_argument("--colunas", nargs="+", help="colunas a guardar (padrão: todas do layout)")
+    conv.add_argument("--replicas", action="store_true", help="inclui os pesos replicados")
+    conv.add_argument("--forcar", action="store_true", help="reconverte mesmo sem mudanças")
+    conv.add_argument("--workers", type=int, default=1, help="processos em paralelo (0 = todos os núcleos)")
+
+    cons = sub.add_parser("consulta", help="tabela ponderada por grupos")
+    cons.add_argument("--por", nargs="+", required=True, help="colunas de agrupamento")
+    cons.add_argument("--filtro", nargs="*", default=[],
+                      help="COL=valor, COL=v1,v2 ou COL=min..max (ex.: Ano=2021 UF=26)")
+    cons.add_argument("--valor", nargs="*", default=[], help="colunas numéricas (soma e média ponderadas)")
+    cons.add_argument("--peso", default="V1028")
+    cons.add_argument("-o", "--output", help="CSV de saída (sep=';', decimal=',')")
+    args = parser.parse_args(argv)
+
+    if args.comando == "converter":
+        done = convert(args.arquivos, args.store, args.colunas, replicates=args.replicas,
+                       force=args.forcar, workers=args.workers)
+        print("Convertidos: " + ", ".join(done) if done else "Nada a fazer: arquivos já convertidos.")
+        return
+
+    filters = dict(_parse_filter(f) for f in args.filtro)
+    table = weighted_table(args.por, filters, args.valor, args.peso, args.store)
+    if args.output:
+        table.to_csv(args.output, sep=";", decimal=",", index=False)
+    else:
+        print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from config import MAX_POINTS
+
+# Nível de agregação temporal das séries dos gráficos
+NIVEIS = {
+    "trimestral": "Trimestral",
+    "anual": "Média anual",
+    "movel": "Média móvel (4 trimestres)",
+}
+NIVEL_PADRAO = "trimestral"
+JANELA_MOVEL = 4
+
+
+def _ratio(num, den):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den != 0, num / den, np.nan)
+
+
+def _frame(ano, periodo, var1, var2, var3, v1, v2) -> pd.DataFrame:
+    # var3 (renda média) é sempre var2 / var1: recalculada a partir das
+    # médias, e não como média das razões
+    return pd.DataFrame({"Ano": ano, "Periodo": periodo, var1: v1, var2: v2, var3: _ratio(v2, v1)})
+
+
+def _segments(keys: np.ndarray):
+    # início e tamanho de cada trecho de chaves iguais consecutivas
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.intp)
+    return starts, np.diff(np.r_[starts, len(keys)])
+
+
+def by_period(dff: pd.DataFrame, var1, var2, var3) -> pd.DataFrame:
+    # Uma linha por período. Com quebras por UF/CNAE, soma as medidas
+    # aditivas (os intervalos de confiança não se somam e são descartados)
+    periodo = dff["Periodo"].to_numpy()
+    starts, counts = _segments(periodo)
+    if len(starts) == len(periodo):
+        return dff
+    v1 = np.add.reduceat(dff[var1].to_numpy(np.float64), starts)
+    v2 = np.add.reduceat(dff[var2].to_numpy(np.float64), starts)
+    return _frame(dff["Ano"].to_numpy()[starts], periodo[starts], var1, var2, var3, v1, v2)
+
+
+def annual(dff: pd.DataFrame, var1, var2, var3) -> pd.DataFrame:
+    # Média dos trimestres de cada ano; anos incompletos indicam quantos
+    # trimestres entraram na média
+    anos = dff["Ano"].to_numpy()
+    starts, counts = _segments(anos)
+    if not len(starts):
+        return _frame([], [], var1, var2, var3, np.array([]), np.array([]))
+    v1 = np.add.reduceat(dff[var1].to_numpy(np.float64), starts) / counts
+    v2 = np.add.reduceat(dff[var2].to_numpy(np.float64), starts) / counts
+    labels = [str(a) if n >= 4 else f"{a} ({n}T)" for a, n in zip(anos[starts], counts)]
+    return _frame(anos[starts], labels, var1, var2, var3, v1, v2)
+
+
+def moving_average(dff: pd.DataFrame, var1, var2, var3, window: int = JANELA_MOVEL) -> pd.DataFrame:
+    # Média móvel dos últimos `window` trimestres; os primeiros ficam vazios
+    v1 = dff[var1].astype(np.float64).rolling(window, min_periods=window).mean().to_numpy()
+    v2 = dff[var2].astype(np.float64).rolling(window, min_periods=window).mean().to_numpy()
+    return _frame(dff["Ano"].to_numpy(), dff["Periodo"].to_numpy(), var1, var2, var3, v1, v2)
+
+
+def _block_mean(x: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    # média por bloco ignorando vazios (ex.: início da média móvel)
+    valid = ~np.isnan(x)
+    total = np.add.reduceat(np.where(valid, x, 0.0), starts)
+    return _ratio(total, np.add.reduceat(valid.astype(np.float64), starts))
+
+
+def downsample(dff: pd.DataFrame, var1, var2, var3, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    # Limita o número de pontos: agrupa períodos consecutivos em no máximo
+    # max_points blocos de tamanho quase igual (média de cada bloco)
+    n = len(dff)
+    if max_points <= 0 or n <= max_points:
+        return dff
+    starts, counts = _segments(np.arange(n) * max_points // n)
+    stops = starts + counts - 1
+    periodo = dff["Periodo"].astype(str).to_numpy()
+    v1 = _block_mean(dff[var1].to_numpy(np.float64), starts)
+    v2 = _block_mean(dff[var2].to_numpy(np.float64), starts)
+    labels = [f"{periodo[a]}–{periodo[b]}" for a, b in zip(starts, stops)]
+    return _frame(dff["Ano"].to_numpy()[starts], labels, var1, var2, var3, v1, v2)
+
+
+def level_frame(view, var1, var2, var3, ano=None, nivel: str = NIVEL_PADRAO,
+                max_points: int = MAX_POINTS) -> pd.DataFrame:
+    # Série no nível pedido, filtrada pelo ano (None = todos);
+    # view(ano) devolve as linhas do módulo (ex.: Snapshot.view)
+    if nivel == "movel":
+        # a média móvel usa os trimestres anteriores ao ano selecionado
+        dff = moving_average(by_period(view(None), var1, var2, var3), var1, var2, var3)
+        if ano is not None:
+            dff = dff[dff["Ano"] == int(ano)]
+    elif nivel == "anual":
+        dff = annual(by_period(view(ano), var1, var2, var3), var1, var2, var3)
+    else:
+        dff = by_period(view(ano), var1, var2, var3)
+    return downsample(dff, var1, var2, var3, max_points)
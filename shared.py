@@ -0,0 +1,128 @@
+"""Dataset normalizado em um arquivo Arrow IPC compartilhado entre processos.
+
+Um processo materializa o frame uma vez (publish); cada worker do Dash
+mapeia o arquivo somente leitura (open_shared), e as colunas numéricas
+apontam direto para as páginas do mmap, que o sistema operacional
+compartilha entre todos os processos. Assim a RAM não cresce com o
+número de workers e a inicialização de cada um é quase instantânea.
+
+Uso:
+
+    python -m shared data/planilha.xlsx -o data/shared/pnad.arrow
+    PNAD_SHARED_PATH=data/shared/pnad.arrow gunicorn -w 8 app:server
+"""
+import argparse
+import json
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from data_loader import BASE_DIR, DATA_PATH, atomic_write, load_data, source_version
+
+try:  # fcntl só existe em POSIX; sem ele, não há trava entre processos
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+SHARED_PATH = BASE_DIR / "data" / "shared" / "pnad.arrow"
+META_KEY = b"pnad"
+
+
+def _plain(df: pd.DataFrame) -> pd.DataFrame:
+    # Int64 (nullable) sem nulos vira int64 NumPy, que o Arrow devolve sem cópia
+    out = df.copy()
+    for col in out.columns:
+        s = out[col]
+        if isinstance(s.dtype, pd.Int64Dtype) and s.notna().all():
+            out[col] = s.to_numpy(dtype=np.int64)
+    return out
+
+
+def publish(df: pd.DataFrame, path: str | Path = SHARED_PATH, version: str = "", compact: bool = False) -> Path:
+    # Grava o frame em Arrow IPC sem compressão (mapeável) e troca o arquivo
+    # de forma atômica: quem já mapeou o antigo continua com ele. Legível
+    # por todos (0644): os workers podem rodar com outro usuário
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(_plain(df), preserve_index=False)
+    meta = {"fingerprint": df.attrs.get("fingerprint", ""), "version": version, "compact": compact}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), META_KEY: json.dumps(meta).encode()})
+
+    with atomic_write(path, mode=0o644) as tmp:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def read_meta(path: str | Path) -> dict:
+    try:
+        with pa.memory_map(str(path), "r") as source:
+            schema = pa.ipc.open_file(source).schema
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return {}
+    return json.loads((schema.metadata or {}).get(META_KEY, b"{}"))
+
+
+def open_shared(path: str | Path = SHARED_PATH) -> pd.DataFrame:
+    # Mapeia o arquivo e monta o frame sem copiar as colunas numéricas
+    source = pa.memory_map(str(path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    meta = json.loads((table.schema.metadata or {}).get(META_KEY, b"{}"))
+    df = table.to_pandas(split_blocks=True, self_destruct=False)
+    df.attrs["fingerprint"] = meta.get("fingerprint", "")
+    df.attrs["versao_compartilhada"] = meta.get("version", "")
+    return df
+
+
+@contextmanager
+def _locked(path: Path):
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_suffix(path.suffix + ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def ensure(source: str | Path = DATA_PATH, path: str | Path = SHARED_PATH, compact: bool = False) -> pd.DataFrame:
+    # Mapeia o arquivo compartilhado, (re)gerando-o antes se a fonte mudou.
+    # Só um processo gera; os demais esperam a trava e mapeiam o resultado.
+    # Um arquivo gerado com outro valor de compact também é regerado.
+    path = Path(path)
+    version = source_version(source)
+
+    def current() -> bool:
+        meta = read_meta(path)
+        return meta.get("version") == version and meta.get("compact", False) == compact
+
+    if current():
+        return open_shared(path)
+
+    with _locked(path):
+        if not current():
+            publish(load_data(source, compact=compact), path, version, compact)
+    return open_shared(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o dataset compartilhado (Arrow IPC) do painel.")
+    parser.add_argument("fonte", nargs="?", default=str(DATA_PATH),
+                        help="planilha/CSV ou diretório do store particionado")
+    parser.add_argument("-o", "--output", default=str(SHARED_PATH), help="arquivo .arrow de saída")
+    parser.add_argument("--compacto", action="store_true", help="tipos compactos (ver compact_frame)")
+    args = parser.parse_args(argv)
+
+    df = load_data(args.fonte, compact=args.compacto)
+    path = publish(df, args.output, source_version(args.fonte), args.compacto)
+    print(f"{len(df)} linhas em {path} ({path.stat().st_size / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Sketch de quantis ponderados para a distribuição da renda.
+
+Histograma de pesos sobre bins logarítmicos fixos, no estilo do DDSketch:
+o bin k >= 1 cobre (MIN_VALUE * GAMMA**(k-2), MIN_VALUE * GAMMA**(k-1)]
+e é representado por um valor a no máximo ALPHA (relativo) de qualquer
+ponto do intervalo; o bin 0 guarda a renda zero. Como os bins são os
+mesmos para todos os grupos, somar dois histogramas é o histograma da
+união: o sketch é construído bloco a bloco e combinado entre processos
+por simples soma, com memória fixa de N_BINS pesos por grupo.
+
+Garantia: para qualquer q, o quantil estimado x^ satisfaz
+|x^ - x_q| <= ALPHA * x_q, onde x_q é o quantil ponderado exato
+(menor x com F(x) >= q). O posto é exato; o erro de posto equivale no
+máximo ao peso do bin que contém x_q. Rendas entre 0 e MIN_VALUE caem
+no primeiro bin e acima de MAX_VALUE no último. O Gini é calculado
+sobre os valores representativos dos bins (erro da ordem de ALPHA).
+"""
+import numpy as np
+
+ALPHA = 0.01
+MIN_VALUE = 1.0
+MAX_VALUE = 1e7
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+_LOG_GAMMA = np.log(GAMMA)
+_K_MAX = int(np.ceil(np.log(MAX_VALUE / MIN_VALUE) / _LOG_GAMMA))
+N_BINS = _K_MAX + 2
+BIN_VALUES = np.r_[0.0, MIN_VALUE * 2 * GAMMA ** np.arange(_K_MAX + 1) / (GAMMA + 1)]
+
+DECIS = tuple(round(0.1 * k, 1) for k in range(1, 10))
+
+
+def distribution_columns(suffix: str) -> dict:
+    # Nome das colunas de distribuição de um módulo (suffix: Total, empregador...)
+    cols = {q: f"Renda D{int(q * 10)}_{suffix}" for q in DECIS}
+    cols[0.5] = f"Renda Mediana_{suffix}"
+    cols["gini"] = f"Gini_{suffix}"
+    return cols
+
+
+def bin_index(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.ceil(np.log(np.maximum(x, MIN_VALUE) / MIN_VALUE) / _LOG_GAMMA)
+    return np.where(x > 0, 1 + np.clip(k, 0, _K_MAX), 0).astype(np.int64)
+
+
+def histogram(inverse: np.ndarray, masks: np.ndarray, x: np.ndarray, weights: np.ndarray,
+              n_groups: int) -> np.ndarray:
+    # Pesos por grupo, coluna de masks e bin: inverse (n,), masks (n, M)
+    # booleana, x e weights (n,) -> (n_groups, M, N_BINS). x NaN não entra.
+    n_cols = masks.shape[1]
+    out = np.zeros((n_groups, n_cols, N_BINS))
+    valid = ~np.isnan(x)
+    bins = bin_index(np.where(valid, x, 0.0))
+    for m in range(n_cols):
+        sel = masks[:, m] & valid
+        flat = inverse[sel] * N_BINS + bins[sel]
+        out[:, m] = np.bincount(flat, weights=weights[sel], minlength=n_groups * N_BINS).reshape(n_groups, N_BINS)
+    return out
+
+
+def quantiles(hist: np.ndarray, qs=DECIS) -> np.ndarray:
+    # hist (..., N_BINS) -> (..., len(qs)); NaN onde não há peso
+    cum = np.cumsum(hist, axis=-1)
+    total = cum[..., -1:]
+    out = np.empty(hist.shape[:-1] + (len(qs),))
+    for i, q in enumerate(qs):
+        idx = (cum < q * total).sum(axis=-1)
+        out[..., i] = BIN_VALUES[np.minimum(idx, N_BINS - 1)]
+    out[total[..., 0] <= 0] = np.nan
+    return out
+
+
+def gini(hist: np.ndarray) -> np.ndarray:
+    # Índice de Gini da distribuição discreta (bins já ordenados)
+    renda = hist * BIN_VALUES
+    s = np.cumsum(renda, axis=-1)
+    s_prev = s - renda
+    w_total = hist.sum(axis=-1)
+    s_total = s[..., -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        g = 1 - (hist * (s_prev + s)).sum(axis=-1) / (w_total * s_total)
+    return np.where((w_total > 0) & (s_total > 0), g, np.nan)
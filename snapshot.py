@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from cube import Cube
+from data_loader import DATA_PATH, build_index, load_data, source_version
+from config import COMPACT_FRAME, RELOAD_INTERVAL, SHARED_PATH
+from figure_cache import FigureCache
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """Dados carregados + índice + cubo UF × CNAE + cache de figuras,
+    imutáveis depois de montados (o cache só ganha entradas para estes
+    mesmos dados)."""
+
+    def __init__(self, df, projections: dict, version: str = ""):
+        self.df = df
+        self.version = version
+        self.number = 0
+        self.index = build_index(df, projections)
+        self.fingerprint = self.index.fingerprint
+        self.anos = [int(a) for a in self.index.anos]
+        self.ano_default = self.anos[0] if self.anos else None
+        self.cube = Cube(df, projections)
+        self.figures = FigureCache()
+
+    def view(self, name: str, ano: int | None = None, filters: dict | None = None):
+        # Sem quebras por UF/CNAE, a projeção do índice (com os intervalos
+        # de confiança); com quebras, a consulta ao cubo
+        if self.cube.dims:
+            return self.cube.view(name, filters, ano)
+        return self.index.view(name, ano)
+
+    def table(self, filters: dict | None = None):
+        # Todas as medidas, uma linha por período (séries do modo navegador)
+        return self.cube.table(filters) if self.cube.dims else self.df
+
+
+class DataStore:
+    """Fonte de dados do app, recarregada quando a origem muda.
+
+    Com o watcher ligado (start_watcher), uma thread verifica a versão da
+    origem (mtime/tamanho, ou o catálogo do store particionado) a cada
+    check_interval segundos, monta o novo snapshot fora do caminho das
+    requisições, chama os listeners (ex.: pré-aquecer figuras) e só então
+    troca a referência. Sem o watcher, current() faz a verificação.
+    Requisições em andamento continuam com o snapshot antigo.
+
+    Com lazy=True nada é lido no construtor: o watcher faz a primeira
+    carga logo ao iniciar (e tenta de novo a cada check_interval se ela
+    falhar) ou, sem watcher, a primeira chamada a current(). Até lá,
+    ready é False e current() espera a primeira tentativa.
+    """
+
+    def __init__(self, projections: dict, path: str | Path | None = None,
+                 check_interval: float = RELOAD_INTERVAL, df=None,
+                 shared_path: str | Path | None = SHARED_PATH, lazy: bool = False):
+        self.path = Path(path) if path else DATA_PATH
+        self.shared_path = shared_path
+        self.projections = projections
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+        self._listeners = []
+        self._watcher = None
+        self._stop = threading.Event()
+        # primeira tentativa de carga concluída (com sucesso ou não)
+        self._attempted = threading.Event()
+        self._snapshot = None
+        self.error = None
+        if df is not None:
+            # frame fornecido pronto: sem recarga automática
+            self.check_interval = None
+            self._snapshot = Snapshot(df, projections)
+            self._attempted.set()
+        elif not lazy:
+            self._snapshot = self._load()
+            self._attempted.set()
+
+    def _load(self) -> Snapshot:
+        version = source_version(self.path)
+        if self.shared_path:
+            from shared import ensure
+
+            df = ensure(self.path, self.shared_path, compact=COMPACT_FRAME)
+        else:
+            df = load_data(self.path, compact=COMPACT_FRAME)
+        return Snapshot(df, self.projections, version)
+
+    def on_load(self, listener: Callable) -> None:
+        # listener(novo, antigo) roda antes da troca de cada novo snapshot
+        self._listeners.append(listener)
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def snapshot(self) -> Snapshot | None:
+        # snapshot corrente sem verificar a origem nem esperar a carga
+        return self._snapshot
+
+    def _first_load(self) -> Snapshot:
+        with self._lock:
+            if self._snapshot is None:
+                try:
+                    new = self._load()
+                except Exception as exc:
+                    self.error = exc
+                    self._attempted.set()
+                    raise
+                self._notify(new, None)
+                self._snapshot, self.error = new, None
+                # só acorda quem espera em current() com o snapshot no lugar
+                self._attempted.set()
+                logger.info("Dados carregados: snapshot %d (%s)", new.number, new.fingerprint[:12])
+        return self._snapshot
+
+    def _notify(self, new: Snapshot, old: Snapshot | None) -> None:
+        for listener in self._listeners:
+            try:
+                listener(new, old)
+            except Exception:
+                logger.exception("Falha ao preparar o snapshot %s", new.fingerprint[:12])
+
+    def current(self) -> Snapshot:
+        if self._snapshot is None:
+            if self._watcher is None:
+                return self._first_load()
+            # a carga inicial está no watcher
+            self._attempted.wait()
+            if self._snapshot is None:
+                raise RuntimeError(f"Dados ainda indisponíveis ({self.path})") from self.error
+            return self._snapshot
+        if self.check_interval is not None and self._watcher is None:
+            now = time.monotonic()
+            if now - self._checked >= self.check_interval:
+                self._checked = now
+                self.refresh()
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        if self._snapshot is None:
+            self._first_load()
+            return True
+        if source_version(self.path) == self._snapshot.version:
+            return False
+        with self._lock:
+            old = self._snapshot
+            if source_version(self.path) == old.version:
+                return False
+            new = self._load()
+            self._notify(new, old)
+            new.number = old.number + 1
+            self._snapshot = new
+        logger.info("Dados recarregados: snapshot %d (%s)", new.number, new.fingerprint[:12])
+        return True
+
+    def start_watcher(self) -> None:
+        if self._watcher is not None or self.check_interval is None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="pnad-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self) -> None:
+        failed = None
+        # sem snapshot (lazy), a primeira carga é imediata
+        wait = 0 if self._snapshot is None else self.check_interval
+        while not self._stop.wait(wait):
+            wait = self.check_interval
+            version = source_version(self.path)
+            # sem snapshot, tenta de novo a cada intervalo mesmo sem mudança
+            # (ex.: falha transitória na primeira carga)
+            if version == failed and self._snapshot is not None:
+                continue
+            try:
+                if self._snapshot is None:
+                    self._first_load()
+                else:
+                    self.refresh()
+            except Exception:
+                # fonte ilegível (ex.: planilha sendo gravada): mantém o
+                # snapshot atual e só tenta de novo quando a origem mudar
+                failed = version
+                logger.exception("Falha ao recarregar %s", self.path)
@@ -0,0 +1,202 @@
+"""Exportação estática do painel, servida sem backend Python.
+
+Renderiza uma vez (em paralelo) as três figuras de cada combinação
+módulo × ano (e "todos os anos") × agregação e grava, num diretório só:
+
+    index.html                      página do Dash com layout e dependências embutidos
+    figuras/<módulo>/<ano>-<nível>.json
+    assets/, _dash-component-suites/  JS/CSS do Dash e do painel
+    manifest.json                   fingerprint dos dados e data da exportação
+
+A interface é a mesma do servidor (layout.make_layout + modulos_tab); o
+único callback é do navegador (pnad.figuras_estaticas em
+assets/clientside.js), que busca o JSON pré-renderizado. O detalhamento
+por UF/seção CNAE fica só no servidor.
+
+Uso:
+
+    python -m static_export -o dist --workers 0
+    python -m http.server -d dist
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import dash
+from dash import ClientsideFunction, Input, Output
+
+from callbacks import render_figures
+from components import APRESENTACAO, GRAPH_IDS, MODULOS, PROJECOES, modulos_tab
+from config import DATA_PATH
+from data_loader import BASE_DIR
+from layout import INDEX_STRING, PAGE_TITLE, make_layout
+from series import NIVEIS
+from snapshot import DataStore, Snapshot
+from webserver import ASSETS_DIR
+
+EXPORT_DIR = BASE_DIR / "dist"
+
+# snapshot do processo de renderização (montado uma vez por worker)
+_SNAPSHOT = None
+
+
+def figure_path(modulo: str, ano: int | None, nivel: str) -> str:
+    # mesmo caminho de pnad.figuras_estaticas
+    return f"figuras/{modulo}/{'todos' if ano is None else ano}-{nivel}.json"
+
+
+def figure_keys(snap: Snapshot) -> list:
+    return [(m, a, n) for m in MODULOS for a in [None, *snap.anos] for n in NIVEIS]
+
+
+def _init_worker(df) -> None:
+    global _SNAPSHOT
+    _SNAPSHOT = Snapshot(df, PROJECOES)
+
+
+def _render(key) -> tuple:
+    # (caminho, lista JSON das três figuras); as figuras já vêm serializadas
+    return figure_path(*key), "[" + ",".join(render_figures(_SNAPSHOT, *key)) + "]"
+
+
+def write_figures(snap: Snapshot, out_dir: Path, workers: int | None = 1) -> int:
+    from aggregation import resolve_workers
+
+    global _SNAPSHOT
+    keys = figure_keys(snap)
+    n_workers = min(resolve_workers(workers), max(len(keys), 1))
+    if n_workers == 1:
+        _SNAPSHOT = snap
+        results = map(_render, keys)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(snap.df,))
+        results = pool.map(_render, keys, chunksize=max(1, len(keys) // (4 * n_workers)))
+    try:
+        for rel, text in results:
+            target = out_dir / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(text, encoding="utf-8")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return len(keys)
+
+
+def static_app(snap: Snapshot) -> dash.Dash:
+    # Mesmo layout do modo navegador, sem o store de séries e sem
+    # detalhamento; as figuras vêm dos arquivos de write_figures
+    app = dash.Dash(__name__, assets_folder=str(ASSETS_DIR), title=PAGE_TITLE)
+    app.index_string = INDEX_STRING
+    app.layout = make_layout(APRESENTACAO, modulos_tab(snap.anos, snap.ano_default, clientside=True))
+    app.clientside_callback(
+        ClientsideFunction(namespace="pnad", function_name="figuras_estaticas"),
+        [Output(graph_id, "figure") for graph_id in GRAPH_IDS],
+        Input("tabs-modulo", "value"),
+        Input("filter-ano", "value"),
+        Input("filter-nivel", "value"),
+    )
+    return app
+
+
+def _save(client, url: str, out_dir: Path) -> None:
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url}: HTTP {response.status_code}")
+    target = out_dir / url.split("?")[0].lstrip("/")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(response.get_data())
+
+
+def write_shell(app: dash.Dash, out_dir: Path) -> None:
+    # index.html com layout/dependências embutidos e os arquivos que ele
+    # referencia, com URLs relativas (o bundle pode ir para um subcaminho)
+    client = app.server.test_client()
+    page = client.get("/").get_data(as_text=True)
+    layout = client.get("/_dash-layout").get_data(as_text=True)
+    embedded = {
+        "_dash-layout": json.loads(layout.replace('"/assets/', '"assets/')),
+        "_dash-dependencies": client.get("/_dash-dependencies").get_json(),
+    }
+
+    urls = set(re.findall(r'(?:src|href)="(/[^"]+)"', page))
+    urls.update(f"/assets/{p.relative_to(ASSETS_DIR).as_posix()}"
+                for p in ASSETS_DIR.rglob("*") if p.is_file() and not p.name.startswith("."))
+    # chunks carregados sob demanda pelos componentes (gráfico, dropdown,
+    # plotly.js): o Dash registra os caminhos ao montar a página
+    urls.update(f"/_dash-component-suites/{package}/{rel}"
+                for package, paths in app.registered_paths.items()
+                for rel in paths if not rel.endswith(".map"))
+    for url in sorted(urls):
+        _save(client, url, out_dir)
+
+    data = json.dumps(embedded).replace("</", "<\\/")
+    page = re.sub(r'((?:src|href)=")/', r"\1./", page)
+    page = page.replace('"requests_pathname_prefix":"\\u002f"', '"requests_pathname_prefix":"./"', 1)
+    page = page.replace(
+        '<script id="_dash-config"',
+        f'<script id="pnad-estatico" type="application/json">{data}</script>\n'
+        '            <script id="_dash-config"',
+        1,
+    )
+    (out_dir / "index.html").write_text(page, encoding="utf-8")
+
+
+def _swap(tmp: Path, out_dir: Path) -> None:
+    # troca o diretório inteiro de uma vez: um servidor de arquivos nunca
+    # vê uma exportação pela metade
+    old = out_dir.with_name(f".{out_dir.name}-antigo")
+    shutil.rmtree(old, ignore_errors=True)
+    if out_dir.exists():
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def export(out_dir: str | Path = EXPORT_DIR, path: str | Path | None = DATA_PATH,
+           workers: int | None = 1) -> dict:
+    snap = DataStore(PROJECOES, path, check_interval=None, shared_path=None).current()
+    out_dir = Path(out_dir).resolve()
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=out_dir.parent, prefix=f".{out_dir.name}-"))
+    try:
+        start = time.perf_counter()
+        n_figures = write_figures(snap, tmp, workers)
+        write_shell(static_app(snap), tmp)
+        manifest = {
+            "fingerprint": snap.fingerprint,
+            "versao": snap.version,
+            "anos": snap.anos,
+            "figuras": n_figures,
+            "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "segundos": round(time.perf_counter() - start, 3),
+        }
+        (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.chmod(tmp, 0o755)
+        _swap(tmp, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta o painel como site estático.")
+    parser.add_argument("fonte", nargs="?", default=DATA_PATH,
+                        help="planilha/CSV ou diretório do store (padrão: PNAD_DATA_PATH)")
+    parser.add_argument("-o", "--output", default=str(EXPORT_DIR), help="diretório de saída")
+    parser.add_argument("--workers", type=int, default=1, help="processos em paralelo (0 = todos os núcleos)")
+    args = parser.parse_args(argv)
+
+    manifest = export(args.output, args.fonte, args.workers)
+    print(f"{manifest['figuras']} conjuntos de figuras em {args.output} ({manifest['segundos']} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+from flask import jsonify, request
+
+try:  # brotli é opcional; sem ele, só gzip
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+BASE_DIR = Path(__file__).resolve().parent
+ASSETS_DIR = BASE_DIR / "assets"
+
+COMPRESSIBLE = (
+    "application/json",
+    "application/javascript",
+    "text/",
+    "image/svg+xml",
+)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@lru_cache(maxsize=None)
+def _asset_hash(path: Path, mtime_ns: int) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+
+
+def asset_url(name: str) -> str:
+    # URL do asset com hash do conteúdo: pode ser guardado em cache para sempre
+    path = ASSETS_DIR / name
+    try:
+        version = _asset_hash(path, path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return f"/assets/{name}"
+    return f"/assets/{name}?v={version}"
+
+
+def _choose_encoding(accept: str) -> str | None:
+    accepted = {part.split(";")[0].strip().lower() for part in accept.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_bytes(data: bytes, encoding: str, level: int = 6) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level)
+
+
+def enable_compression(server, min_size: int = 1024, level: int = 6) -> None:
+    # Comprime respostas (callbacks, layout, JS/CSS) acima de min_size bytes
+    @server.after_request
+    def pnad_compress(response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or not response.mimetype
+            or not response.mimetype.startswith(COMPRESSIBLE)
+        ):
+            return response
+
+        encoding = _choose_encoding(request.headers.get("Accept-Encoding", ""))
+        response.vary.add("Accept-Encoding")
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        response.set_data(compress_bytes(data, encoding, level))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def enable_asset_caching(server) -> None:
+    # Assets versionados (?v= de asset_url ou ?m= do próprio Dash) não mudam:
+    # cache imutável por um ano
+    @server.after_request
+    def pnad_asset_cache(response):
+        if (
+            request.path.startswith("/assets/")
+            and response.status_code == 200
+            and ("v" in request.args or "m" in request.args)
+        ):
+            response.headers["Cache-Control"] = IMMUTABLE
+            response.headers.pop("Expires", None)
+        return response
+
+
+def enable_health_checks(server, store) -> None:
+    # /healthz: o processo responde; /readyz: dados carregados (503 até a
+    # primeira carga, com o erro dela, se houver). Nenhum dos dois dispara
+    # a carga nem verifica a origem.
+    @server.route("/healthz")
+    def pnad_healthz():
+        return jsonify(status="ok")
+
+    @server.route("/readyz")
+    def pnad_readyz():
+        snap = store.snapshot
+        if snap is None:
+            error = repr(store.error) if store.error is not None else None
+            return jsonify(pronto=False, erro=error), 503
+        return jsonify(pronto=True, snapshot=snap.number, fingerprint=snap.fingerprint[:12],
+                       versao=snap.version)